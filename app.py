@@ -1,20 +1,38 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, current_app, abort
 import os
 from datetime import datetime
 import json
 from dotenv import load_dotenv
+from werkzeug.utils import secure_filename
+from flask_login import LoginManager, current_user, login_required
 
-load_dotenv()
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///herbal_garden.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+from models import db, User, Plant, Category, RelatedPlant
+from auth import auth
+from assets import assets
+from compression import compression
+from catalogue import catalogue
+from suggest import suggestion_index
+from name_index import name_index
+from spelling import spelling_index
+from client_index import client_search_index
+from facets import facet_index, parse_filters
+from plant_properties import property_tables, filter_by_properties
+from related import related_plants
+from symptom_index import symptom_index
+from semantic_index import semantic_index
+from taxonomy import taxonomy, match_plants
+from duplicates import duplicate_index
+from metrics import metrics, resident_memory
+from profiler import profiler, collapsed, hot_functions
+from memory import memory_tracker
+from slow_queries import slow_query_log
+from traffic_capture import traffic_capture
+from circuit_breaker import CircuitBreaker
+from login_tracker import last_login_buffer
+from password_hasher import password_hasher, default_workers
+from translations import get_translation
 
-# Configure upload folders
-app.config['UPLOAD_FOLDER'] = 'static/images/plants'
-app.config['IDENTIFICATION_UPLOAD_FOLDER'] = 'static/images/identifications'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+load_dotenv()
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -22,31 +40,127 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Initialize extensions after app creation to avoid circular imports
-from flask_login import LoginManager, current_user, login_required
-from models import db
-
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'error'
 
-# Import models after db initialization
-from models import User, Plant, Category
-
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# Import blueprints after app creation
-from auth import auth
-app.register_blueprint(auth)
-
-# Import translations
-from translations import get_translation
+def create_app(config=None):
+    """Application factory. `config` overrides the environment-derived defaults."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///herbal_garden.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+    app.config['LAST_LOGIN_FLUSH_INTERVAL'] = float(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 5))
+    
+    # Password hashing (see password_hasher.py)
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', default_workers()))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0)) or None
+    
+    # Configure upload folders
+    app.config['UPLOAD_FOLDER'] = 'static/images/plants'
+    app.config['IDENTIFICATION_UPLOAD_FOLDER'] = 'static/images/identifications'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+    
+    # Rebuild static/dist bundles at startup when sources changed (see assets.py)
+    app.config['ASSETS_AUTO_BUILD'] = os.getenv('ASSETS_AUTO_BUILD', '1') == '1'
+    
+    # gzip/Brotli for dynamic responses (see compression.py)
+    app.config['COMPRESSION_ENABLED'] = os.getenv('COMPRESSION_ENABLED', '1') == '1'
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.getenv('COMPRESSION_MIN_SIZE', 500))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # How often in-memory search indexes check for changes made by other processes
+    app.config['CATALOGUE_SYNC_INTERVAL'] = float(os.getenv('CATALOGUE_SYNC_INTERVAL', 30))
+    
+    # Prometheus /metrics; collection starts with the first scrape (see metrics.py)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+    app.config['METRICS_IDLE_TIMEOUT'] = float(os.getenv('METRICS_IDLE_TIMEOUT', 300))
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN') or None
+    # Shared by worker processes so a scrape covers all of them (serve.py sets it)
+    app.config['METRICS_MULTIPROC_DIR'] = os.getenv('METRICS_MULTIPROC_DIR') or None
+    
+    # Admin-only ?_profile=1 request profiling (see profiler.py)
+    app.config['PROFILER_ENABLED'] = os.getenv('PROFILER_ENABLED', '1') == '1'
+    app.config['PROFILER_INTERVAL'] = float(os.getenv('PROFILER_INTERVAL', 0.001))
+    
+    # tracemalloc report and sampled per-route peak allocation (see memory.py)
+    app.config['MEMORY_SAMPLE_RATE'] = float(os.getenv('MEMORY_SAMPLE_RATE', 0.01))
+    app.config['MEMORY_TRACE_AT_START'] = os.getenv('MEMORY_TRACE_AT_START', '0') == '1'
+    
+    # Log statements slower than this, with their query plan (see slow_queries.py)
+    app.config['SLOW_QUERY_ENABLED'] = os.getenv('SLOW_QUERY_ENABLED', '1') == '1'
+    app.config['SLOW_QUERY_THRESHOLD'] = float(os.getenv('SLOW_QUERY_THRESHOLD', 0.1))
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG') or None
+    
+    # Plant.id: the built-in demo responses are used unless an API URL is set,
+    # e.g. https://api.plant.id/v2 or a local `python fake_plant_id.py`
+    app.config['PLANT_ID_API_URL'] = os.getenv('PLANT_ID_API_URL') or None
+    app.config['PLANT_ID_API_KEY'] = os.getenv('PLANT_ID_API_KEY', '')
+    app.config['PLANT_ID_API_TIMEOUT'] = float(os.getenv('PLANT_ID_API_TIMEOUT', 15))
+    app.config['PLANT_ID_CIRCUIT_OPEN_SECONDS'] = float(os.getenv('PLANT_ID_CIRCUIT_OPEN_SECONDS', 30))
+    
+    # Record sanitized requests for `python -m benchmarks.replay` (see traffic_capture.py)
+    app.config['TRAFFIC_CAPTURE_ENABLED'] = os.getenv('TRAFFIC_CAPTURE_ENABLED', '0') == '1'
+    app.config['TRAFFIC_CAPTURE_SAMPLE_RATE'] = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', 1.0))
+    
+    if config:
+        app.config.update(config)
+    
+    # Initialize extensions
+    metrics.init_app(app)
+    profiler.init_app(app)
+    memory_tracker.init_app(app)
+    slow_query_log.init_app(app)
+    traffic_capture.init_app(app)
+    if app.config['PLANT_ID_API_URL']:
+        from plant_id_api import PlantIdAPI
+        timeout = app.config['PLANT_ID_API_TIMEOUT']
+        breaker = CircuitBreaker('plant.id', slow_call=timeout / 2,
+                                 open_seconds=app.config['PLANT_ID_CIRCUIT_OPEN_SECONDS'])
+        app.extensions['plant_id_api'] = PlantIdAPI(app.config['PLANT_ID_API_KEY'],
+                                                    base_url=app.config['PLANT_ID_API_URL'],
+                                                    timeout=timeout, breaker=breaker)
+    db.init_app(app)
+    login_manager.init_app(app)
+    last_login_buffer.init_app(app)
+    password_hasher.init_app(app)
+    assets.init_app(app)
+    compression.init_app(app)
+    catalogue.init_app(app)
+    client_search_index.init_app(app)
+    property_tables.init_app(app)
+    related_plants.init_app(app)
+    symptom_index.init_app(app)
+    semantic_index.init_app(app)
+    taxonomy.init_app(app)
+    
+    app.register_blueprint(auth)
+    app.context_processor(inject_global_variables)
+    register_routes(app)
+    
+    return app
+
+def init_database(app):
+    """Create tables and upload directories for a fresh deployment"""
+    with app.app_context():
+        db.create_all()
+        # Columns added after the first release, before anything queries Plant
+        taxonomy.migrate()
+        # Backfill normalized property tables for plants that predate them
+        property_tables.migrate(only_missing=True)
+        if not RelatedPlant.query.first():
+            related_plants.compute_all()
+    
+    # Ensure upload directories exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['IDENTIFICATION_UPLOAD_FOLDER'], exist_ok=True)
 
-@app.context_processor
 def inject_global_variables():
     """Inject global variables into all templates"""
     current_language = session.get('language', 'en')
@@ -62,7 +176,36 @@ def inject_global_variables():
         t=translate
     )
 
-@app.route('/')
+def facet_search(query, category_id, with_counts=True, approved_only=True, candidates=None):
+    """
+    Apply the property facets in the request (rasa=Tikta&dosha=Pitta...) to
+    an already text/approval-filtered query using the in-memory bitset
+    index. Returns the narrowed query and the FacetResult with live counts.
+    The bitsets only cover approved plants; when the query may include
+    pending ones the filters run as joins on the property tables instead.
+    `candidates` are the plant ids the query is already limited to, if known.
+    """
+    facet_filters = parse_filters(request.args)
+    mode = 'all' if request.args.get('match') == 'all' else 'any'
+    
+    filters = dict(facet_filters)
+    if category_id:
+        filters['category'] = [str(category_id)]
+    
+    # Only text search needs SQL to find the candidates; categories are bitsets too
+    if candidates is None and request.args.get('q'):
+        candidates = [plant_id for (plant_id,) in query.with_entities(Plant.id)]
+    
+    result = facet_index.query(filters, candidates=candidates, mode=mode, with_counts=with_counts)
+    if facet_filters and approved_only:
+        # The bitset result already reflects the text and category filters
+        return Plant.query.filter(Plant.id.in_(result.ids)), facet_filters, result
+    if facet_filters:
+        query = filter_by_properties(query, facet_filters, mode)
+    if category_id:
+        query = query.join(Plant.categories).filter(Category.id == category_id)
+    return query, facet_filters, result
+
 def index():
     from models import Plant, Category
     
@@ -75,11 +218,10 @@ def index():
     if not current_user.is_authenticated or not current_user.is_admin():
         query = query.filter_by(is_approved=True)
     
-    if category_id:
-        query = query.join(Plant.categories).filter(Category.id == category_id)
-    
     if search_query:
+        # Cross-script matches ("tulsi" -> तुलसी) come from the name index
         query = query.filter(
+            Plant.id.in_(name_index.lookup(search_query)) |
             Plant.name.ilike(f'%{search_query}%') | 
             Plant.scientific_name.ilike(f'%{search_query}%') |
             Plant.hindi_name.ilike(f'%{search_query}%') |
@@ -87,28 +229,38 @@ def index():
             Plant.common_names.ilike(f'%{search_query}%')
         )
     
+    is_admin = current_user.is_authenticated and current_user.is_admin()
+    query, facet_filters, facets = facet_search(query, category_id, approved_only=not is_admin)
     plants = query.all()
     categories = Category.query.all()
     
+    did_you_mean = None
+    if search_query and not plants:
+        corrections = spelling_index.correct(search_query, limit=1)
+        if corrections:
+            did_you_mean = corrections[0]['text']
+    
     return render_template('index.html', 
                          plants=plants, 
                          categories=categories, 
                          selected_category=category_id,
-                         search_query=search_query)
+                         search_query=search_query,
+                         did_you_mean=did_you_mean,
+                         facet_counts=facets.counts,
+                         facet_filters=facet_filters,
+                         facet_mode=request.args.get('match', 'any'))
 
-@app.route('/plant/<int:plant_id>')
 def plant_detail(plant_id):
     from models import Plant
     plant = Plant.query.get_or_404(plant_id)
-    return render_template('plant_detail.html', plant=plant)
+    related = related_plants.for_plant(plant.id) if plant.is_approved else []
+    return render_template('plant_detail.html', plant=plant, related=related)
 
-@app.route('/categories')
 def categories():
     from models import Category
     categories = Category.query.all()
     return render_template('categories.html', categories=categories)
 
-@app.route('/category/<int:category_id>')
 def category_plants(category_id):
     from models import Category, Plant
     category = Category.query.get_or_404(category_id)
@@ -116,7 +268,6 @@ def category_plants(category_id):
     all_categories = Category.query.all()
     return render_template('index.html', plants=plants, categories=all_categories, selected_category=category_id)
 
-@app.route('/add-plant', methods=['GET', 'POST'])
 @login_required
 def add_plant():
     from models import Category, Plant
@@ -171,7 +322,10 @@ def add_plant():
                     filename = secure_filename(file.filename)
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     image_filename = f"{timestamp}_{filename}"
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
+                    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], image_filename))
+            
+            # Warn (but still accept) when this looks like a plant we already have
+            duplicates = duplicate_index.find(name, scientific_name, hindi_name, limit=3)
             
             # Create new plant
             new_plant = Plant(
@@ -222,6 +376,10 @@ def add_plant():
                 flash('Plant added successfully!', 'success')
             else:
                 flash('Plant added successfully! It will be visible after admin approval.', 'info')
+            if duplicates:
+                similar = Plant.query.filter(Plant.id.in_([plant_id for plant_id, score in duplicates])).all()
+                flash('This looks similar to: ' + ', '.join(sorted(plant.name for plant in similar)) +
+                      '. A moderator will check it is not a duplicate.', 'warning')
             
             return redirect(url_for('index'))
             
@@ -231,7 +389,6 @@ def add_plant():
     
     return render_template('add_plant.html', categories=categories)
 
-@app.route('/identify-plant', methods=['GET', 'POST'])
 def identify_plant():
     from models import PlantIdentification, Plant
     
@@ -262,7 +419,7 @@ def identify_plant():
                 }
             return None
     
-    plant_id_api = MockPlantIdAPI()
+    plant_id_api = current_app.extensions.get('plant_id_api') or MockPlantIdAPI()
     
     if request.method == 'POST':
         if 'plant_image' not in request.files:
@@ -280,10 +437,10 @@ def identify_plant():
                 filename = secure_filename(file.filename)
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 image_filename = f"{timestamp}_{filename}"
-                image_path = os.path.join(app.config['IDENTIFICATION_UPLOAD_FOLDER'], image_filename)
+                image_path = os.path.join(current_app.config['IDENTIFICATION_UPLOAD_FOLDER'], image_filename)
                 file.save(image_path)
                 
-                # Call Plant.id API (mock for now)
+                # Call Plant.id API (demo responses unless PLANT_ID_API_URL is set)
                 result = plant_id_api.identify_plant(image_path)
                 
                 if result['success']:
@@ -300,12 +457,16 @@ def identify_plant():
                         user_id=current_user.id if current_user.is_authenticated else None
                     )
                     
-                    # Try to find matching plant in database
+                    # Match the best suggestion (or its synonyms, then the
+                    # runners-up) to the catalogue by canonical binomial
                     if parsed_results:
-                        scientific_name = parsed_results['scientific_name']
-                        matching_plant = Plant.query.filter(
-                            Plant.scientific_name.ilike(f'%{scientific_name}%')
-                        ).first()
+                        names = [parsed_results['scientific_name']]
+                        for suggestion in parsed_results.get('all_suggestions', []):
+                            names.append(suggestion.get('plant_name'))
+                            names.extend(suggestion.get('plant_details', {}).get('synonyms') or [])
+                        names = [name for name in names if name]
+                        matches = match_plants(names)
+                        matching_plant = next((matches[name] for name in names if name in matches), None)
                         
                         if matching_plant:
                             identification.suggested_plant_id = matching_plant.id
@@ -333,9 +494,15 @@ def identify_plant():
         PlantIdentification.created_at.desc()
     ).limit(5).all()
     
-    return render_template('identify_plant.html', recent_identifications=recent_identifications)
+    # Resolve every recent species in one lookup (picks up plants added since)
+    recent_matches = match_plants(
+        [ident.identified_species for ident in recent_identifications if ident.identified_species],
+        approved_only=True
+    )
+    
+    return render_template('identify_plant.html', recent_identifications=recent_identifications,
+                           recent_matches=recent_matches)
 
-@app.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
     from models import Plant, Category, PlantIdentification, User
@@ -354,9 +521,76 @@ def admin_dashboard():
         'pending_plants': Plant.query.filter_by(is_approved=False).all()
     }
     
-    return render_template('admin_dashboard.html', stats=stats)
+    # Likely duplicates of each pending submission, loaded in one query
+    matches = {plant.id: duplicate_index.for_plant(plant, limit=3) for plant in stats['pending_plants']}
+    similar_ids = {plant_id for found in matches.values() for plant_id, score in found}
+    similar = {plant.id: plant for plant in Plant.query.filter(Plant.id.in_(similar_ids))} if similar_ids else {}
+    possible_duplicates = {
+        plant_id: [(similar[other_id], score) for other_id, score in found if other_id in similar]
+        for plant_id, found in matches.items() if found
+    }
+    
+    return render_template('admin_dashboard.html', stats=stats, possible_duplicates=possible_duplicates,
+                           profiles=profiler.recent(5))
+
+@login_required
+def admin_profiles():
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('admin_profiles.html', profiles=profiler.recent())
+
+@login_required
+def admin_profile(profile_id):
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    profile = profiler.load(profile_id)
+    if profile is None:
+        abort(404)
+    queries = sorted(profile['queries'], key=lambda query: -query['duration'])
+    return render_template('admin_profile.html', profile=profile, queries=queries,
+                           hot_functions=hot_functions(profile))
+
+@login_required
+def admin_profile_collapsed(profile_id):
+    if not current_user.is_admin():
+        abort(403)
+    
+    profile = profiler.load(profile_id)
+    if profile is None:
+        abort(404)
+    return current_app.response_class(
+        collapsed(profile), mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename={profile_id}.collapsed.txt'}
+    )
+
+@login_required
+def admin_memory():
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        action = request.form.get('action')
+        if action == 'start':
+            memory_tracker.start()
+            flash('Allocation tracing started for this worker.', 'info')
+        elif action == 'stop':
+            memory_tracker.stop()
+            flash('Allocation tracing stopped.', 'info')
+        elif action == 'baseline':
+            memory_tracker.set_baseline()
+            flash('Baseline snapshot taken; growth is measured from now.', 'info')
+        return redirect(url_for('admin_memory'))
+    
+    return render_template('admin_memory.html', report=memory_tracker.report(),
+                           tracing=memory_tracker.tracing, has_baseline=memory_tracker.baseline is not None,
+                           route_peaks=memory_tracker.route_peaks(), sample_rate=memory_tracker.sample_rate,
+                           rss=resident_memory(), pid=os.getpid())
 
-@app.route('/admin/approve-plant/<int:plant_id>')
 @login_required
 def approve_plant(plant_id):
     from models import Plant
@@ -374,7 +608,6 @@ def approve_plant(plant_id):
     flash('Plant approved successfully!', 'success')
     return redirect(url_for('admin_dashboard'))
 
-@app.route('/admin/reject-plant/<int:plant_id>', methods=['POST'])
 @login_required
 def reject_plant(plant_id):
     from models import Plant
@@ -393,7 +626,6 @@ def reject_plant(plant_id):
     flash('Plant rejected and removed.', 'success')
     return redirect(url_for('admin_dashboard'))
 
-@app.route('/user/dashboard')
 @login_required
 def user_dashboard():
     from models import Plant, PlantIdentification
@@ -414,14 +646,12 @@ def user_dashboard():
                          identifications=user_identifications,
                          stats=stats)
 
-@app.route('/set-language/<lang>')
 def set_language(lang):
     """Set language preference"""
     if lang in ['en', 'hi', 'es']:
         session['language'] = lang
     return redirect(request.referrer or url_for('index'))
 
-@app.route('/set-theme/<theme>')
 def set_theme(theme):
     """Set theme preference"""
     if theme in ['light', 'dark']:
@@ -429,58 +659,109 @@ def set_theme(theme):
     return redirect(request.referrer or url_for('index'))
 
 # API endpoints
-@app.route('/api/plants')
 def api_plants():
     from models import Plant
     plants = Plant.query.all()
     return jsonify([plant.to_dict() for plant in plants])
 
-@app.route('/api/plant/<int:plant_id>')
 def api_plant_detail(plant_id):
     from models import Plant
     plant = Plant.query.get_or_404(plant_id)
     return jsonify(plant.to_dict())
 
-@app.route('/api/categories')
 def api_categories():
     from models import Category
     categories = Category.query.all()
     return jsonify([category.to_dict() for category in categories])
 
-@app.route('/api/search')
 def api_search():
     from models import Plant, Category
     
     query = request.args.get('q', '')
     category_id = request.args.get('category', type=int)
     
+    # Ranked modes: words in the medicinal text, or closeness in meaning
+    mode = request.args.get('mode')
+    if mode == 'symptom':
+        return ranked_search(symptom_index.search(query, limit=50), category_id)
+    if mode == 'semantic':
+        return ranked_search(semantic_index.search(query, limit=50), category_id)
+    
     plants_query = Plant.query
     
     if query:
         plants_query = plants_query.filter(
+            Plant.id.in_(name_index.lookup(query)) |
             Plant.name.ilike(f'%{query}%') | 
             Plant.scientific_name.ilike(f'%{query}%') |
             Plant.hindi_name.ilike(f'%{query}%') |
             Plant.ayurvedic_name.ilike(f'%{query}%')
         )
     
-    if category_id:
-        plants_query = plants_query.join(Plant.categories).filter(Category.id == category_id)
+    # ?facets=1 wraps the results and adds live per-facet counts
+    include_counts = request.args.get('facets') == '1'
+    plants_query, facet_filters, facets = facet_search(plants_query, category_id, with_counts=include_counts)
     
     plants = plants_query.limit(50).all()
+    if include_counts:
+        return jsonify({
+            'plants': [plant.to_dict() for plant in plants],
+            'filters': facet_filters,
+            'facets': facets.counts
+        })
     return jsonify([plant.to_dict() for plant in plants])
 
-if __name__ == '__main__':
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-    
-    # Ensure upload directories exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['IDENTIFICATION_UPLOAD_FOLDER'], exist_ok=True)
+def ranked_search(ranked, category_id):
+    """JSON for [(plant_id, score)] from a ranking index, narrowed by any facets"""
+    scores = dict(ranked)
+    plants_query = Plant.query.filter(Plant.id.in_(scores))
+    plants_query, facet_filters, facets = facet_search(plants_query, category_id, with_counts=False,
+                                                       candidates=list(scores))
     
+    plants = sorted(plants_query.all(), key=lambda plant: (-scores[plant.id], plant.id))
+    return jsonify([dict(plant.to_dict(), score=round(scores[plant.id], 4)) for plant in plants])
 
-port = int(os.environ.get("PORT", 5000))
-app.run(host="0.0.0.0", port=port, debug=True)
+def api_suggest():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    return jsonify(suggestion_index.suggest(query, limit=limit))
 
+def api_did_you_mean():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 5, type=int), 20))
+    return jsonify({
+        'query': query,
+        'suggestions': spelling_index.correct(query, limit=limit)
+    })
+
+def register_routes(app):
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/plant/<int:plant_id>', view_func=plant_detail)
+    app.add_url_rule('/categories', view_func=categories)
+    app.add_url_rule('/category/<int:category_id>', view_func=category_plants)
+    app.add_url_rule('/add-plant', view_func=add_plant, methods=['GET', 'POST'])
+    app.add_url_rule('/identify-plant', view_func=identify_plant, methods=['GET', 'POST'])
+    app.add_url_rule('/admin/dashboard', view_func=admin_dashboard)
+    app.add_url_rule('/admin/approve-plant/<int:plant_id>', view_func=approve_plant)
+    app.add_url_rule('/admin/reject-plant/<int:plant_id>', view_func=reject_plant, methods=['POST'])
+    app.add_url_rule('/admin/profiles', view_func=admin_profiles)
+    app.add_url_rule('/admin/memory', view_func=admin_memory, methods=['GET', 'POST'])
+    app.add_url_rule('/admin/profiles/<profile_id>', view_func=admin_profile)
+    app.add_url_rule('/admin/profiles/<profile_id>/collapsed', view_func=admin_profile_collapsed)
+    app.add_url_rule('/user/dashboard', view_func=user_dashboard)
+    app.add_url_rule('/set-language/<lang>', view_func=set_language)
+    app.add_url_rule('/set-theme/<theme>', view_func=set_theme)
+    app.add_url_rule('/api/plants', view_func=api_plants)
+    app.add_url_rule('/api/plant/<int:plant_id>', view_func=api_plant_detail)
+    app.add_url_rule('/api/categories', view_func=api_categories)
+    app.add_url_rule('/api/search', view_func=api_search)
+    app.add_url_rule('/api/suggest', view_func=api_suggest)
+    app.add_url_rule('/api/did-you-mean', view_func=api_did_you_mean)
 
+if __name__ == '__main__':
+    app = create_app()
+    init_database(app)
+    
+    # Development server only; use `python serve.py` in production
+    port = int(os.environ.get("PORT", 5000))
+    app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,312 @@
+"""
+Static asset pipeline: bundling, minification and fingerprinting.
+
+    python assets.py extract   # move inline <style> blocks out of templates
+    python assets.py build     # write static/dist/* and static/dist/manifest.json
+
+`build` concatenates the sources of each bundle, minifies them, and writes
+them under content-hashed names (css/site.3f2a9c1d04be.css) together with
+precompressed .gz/.br siblings for compression.py to serve. Templates
+refer to assets by logical name via asset_url('css/site.css'), which looks
+the name up in the manifest, so a changed file gets a new URL and every
+fingerprinted file under static/dist/ can be cached forever.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+from flask import request, url_for
+
+import compression
+
+# Logical bundle name -> source files, relative to the static folder
+BUNDLES = {
+    'css/site.css': ['css/style.css', 'css/animations.css', 'css/dark-mode.css'],
+    'js/site.js': ['js/search.js'],
+}
+
+# Per-page stylesheets extracted from templates; each is its own bundle
+PAGE_STYLES_DIR = 'css/pages'
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+FINGERPRINT_LENGTH = 12
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+_CSS_SPACE_AFTER_COLON = re.compile(r':\s+')
+_INLINE_STYLE = re.compile(r'\n?<style>(.*?)</style>\n?', re.S)
+
+
+def minify_css(source):
+    source = _CSS_COMMENT.sub('', source)
+    source = re.sub(r'\s+', ' ', source)
+    source = _CSS_SPACE_AROUND.sub(r'\1', source)
+    source = _CSS_SPACE_AFTER_COLON.sub(':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """
+    Conservative JS minifier: drops comments, indentation and blank lines
+    but keeps line breaks so automatic semicolon insertion is unaffected.
+    String, template and regex literals are copied through untouched.
+    """
+    out = []
+    i, n = 0, len(source)
+    last_significant = ''
+    at_line_start = True
+
+    while i < n:
+        ch = source[i]
+
+        if ch in ' \t' and at_line_start:
+            i += 1
+            continue
+
+        if ch == '\n' or ch == '\r':
+            if not at_line_start:
+                out.append('\n')
+            at_line_start = True
+            i += 1
+            continue
+
+        if ch == '/' and i + 1 < n and source[i + 1] == '/':
+            while i < n and source[i] != '\n':
+                i += 1
+            # Trailing whitespace before the comment
+            while out and out[-1] in ' \t':
+                out.pop()
+            continue
+
+        if ch == '/' and i + 1 < n and source[i + 1] == '*':
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+
+        at_line_start = False
+
+        if ch in '"\'`':
+            j = i + 1
+            while j < n and source[j] != ch:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            last_significant = ch
+            continue
+
+        if ch == '/' and (last_significant == '' or last_significant in '(,=:[!&|?{};+-*%<>~^'):
+            # Regex literal
+            j, in_class = i + 1, False
+            while j < n and source[j] != '\n':
+                c = source[j]
+                if c == '\\':
+                    j += 2
+                    continue
+                if c == '[':
+                    in_class = True
+                elif c == ']':
+                    in_class = False
+                elif c == '/' and not in_class:
+                    break
+                j += 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            last_significant = '/'
+            continue
+
+        out.append(ch)
+        if not ch.isspace():
+            last_significant = ch
+        i += 1
+
+    return ''.join(out).strip() + '\n'
+
+
+def _minify(name, source):
+    if name.endswith('.css'):
+        return minify_css(source)
+    if name.endswith('.js'):
+        return minify_js(source)
+    return source
+
+
+def _fingerprinted(name, content):
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest}{ext}'
+
+
+def immutable_url_pattern(static_url_path):
+    """Matches URLs of fingerprinted outputs; manifest.json keeps its name, so it isn't one"""
+    return re.compile(rf'^{re.escape(static_url_path)}/{DIST_DIR}/.+\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}\.\w+$')
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def precompress(path):
+    """Write .gz (and .br when Brotli is installed) siblings at maximum level"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('gzip', '.gz')]
+    if compression.brotli is not None:
+        variants.append(('br', '.br'))
+    for coding, suffix in variants:
+        if os.path.exists(path + suffix):
+            continue
+        encoded = compression.compress(data, coding, gzip_level=9, brotli_quality=11)
+        tmp = f'{path}{suffix}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp, path + suffix)
+
+
+def collect_bundles(static_folder):
+    bundles = dict(BUNDLES)
+    pages_dir = os.path.join(static_folder, PAGE_STYLES_DIR)
+    if os.path.isdir(pages_dir):
+        for filename in sorted(os.listdir(pages_dir)):
+            if filename.endswith('.css'):
+                name = f'{PAGE_STYLES_DIR}/{filename}'
+                bundles[name] = [name]
+    return bundles
+
+
+def build(static_folder):
+    """Build every bundle into static/dist and return the manifest"""
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+
+    for name, sources in collect_bundles(static_folder).items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(f.read())
+        content = _minify(name, '\n'.join(parts))
+        output = _fingerprinted(name, content)
+        path = os.path.join(dist_folder, output)
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+        precompress(path)
+        manifest[name] = f'{DIST_DIR}/{output}'
+
+    _write_atomic(os.path.join(dist_folder, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def extract_inline_styles(template_folder, static_folder):
+    """
+    Move each template's inline <style> block into static/css/pages/<template>.css
+    and link it from a top-level {% block styles %} instead. Idempotent.
+    """
+    extracted = []
+    for filename in sorted(os.listdir(template_folder)):
+        if not filename.endswith('.html'):
+            continue
+        path = os.path.join(template_folder, filename)
+        with open(path, encoding='utf-8') as f:
+            template = f.read()
+
+        blocks = _INLINE_STYLE.findall(template)
+        if not blocks or any('{{' in b or '{%' in b for b in blocks):
+            continue
+
+        name = f'{PAGE_STYLES_DIR}/{os.path.splitext(filename)[0]}.css'
+        css = '\n'.join(block.strip('\n') for block in blocks) + '\n'
+        _write_atomic(os.path.join(static_folder, name), css)
+
+        template = _INLINE_STYLE.sub('\n', template)
+        link = (
+            '{% block styles %}\n'
+            f'<link rel="stylesheet" href="{{{{ asset_url(\'{name}\') }}}}">\n'
+            '{% endblock %}\n'
+        )
+        lines = template.split('\n', 1)
+        template = f'{lines[0]}\n\n{link}{lines[1]}'
+        _write_atomic(path, template)
+        extracted.append(name)
+
+    return extracted
+
+
+class Assets:
+    """Serves fingerprinted bundles and exposes asset_url() to templates."""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self._manifest_mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_AUTO_BUILD', True)
+        self.app = app
+        self.static_folder = app.static_folder
+        self.manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+        self.immutable_url = immutable_url_pattern(app.static_url_path)
+
+        self._load_manifest()
+        if app.config['ASSETS_AUTO_BUILD'] and self._is_stale():
+            build(self.static_folder)
+            self._load_manifest()
+
+        app.extensions['assets'] = self
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.after_request(self._cache_headers)
+
+    def asset_url(self, name):
+        if self.app.debug and self._is_stale():
+            build(self.static_folder)
+            self._load_manifest()
+        filename = self.manifest.get(name, name)
+        return url_for('static', filename=filename)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            self._manifest_mtime = os.path.getmtime(self.manifest_path)
+        except (OSError, ValueError):
+            self.manifest = {}
+            self._manifest_mtime = None
+
+    def _is_stale(self):
+        if self._manifest_mtime is None:
+            return True
+        for sources in collect_bundles(self.static_folder).values():
+            for source in sources:
+                if os.path.getmtime(os.path.join(self.static_folder, source)) > self._manifest_mtime:
+                    return True
+        return False
+
+    def _cache_headers(self, response):
+        if response.status_code == 200 and self.immutable_url.match(request.path):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+assets = Assets()
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.abspath(__file__))
+    static = os.path.join(root, 'static')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'extract':
+        for name in extract_inline_styles(os.path.join(root, 'templates'), static):
+            print(f'extracted {name}')
+    elif command == 'build':
+        for name, output in build(static).items():
+            print(f'{name} -> {output}')
+    else:
+        sys.exit(f'unknown command {command!r}; expected "extract" or "build"')
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
-from datetime import datetime
+from login_tracker import last_login_buffer
+from password_hasher import HasherBusyError
 
 auth = Blueprint('auth', __name__)
 
@@ -17,10 +18,15 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password) and user.is_active:
+        try:
+            password_ok = bool(user) and user.check_password(password)
+        except HasherBusyError:
+            flash('The server is busy right now. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        
+        if password_ok and user.is_active:
             login_user(user, remember=remember)
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            last_login_buffer.record(user.id)
             
             flash(f'Welcome back, {user.username}!', 'success')
             
@@ -65,7 +71,11 @@ def register():
             last_name=last_name,
             role='user'  # Default role
         )
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except HasherBusyError:
+            flash('The server is busy right now. Please try again in a moment.', 'error')
+            return render_template('register.html'), 503
         
         db.session.add(user)
         db.session.commit()
@@ -99,8 +109,7 @@ def demo_login(role):
         user = User.query.filter_by(username=demo_users[role]['username']).first()
         if user:
             login_user(user)
-            user.last_login = datetime.utcnow()
-            db.session.commit()
+            last_login_buffer.record(user.id)
             flash(f'Demo {role} login successful!', 'success')
         else:
             flash('Demo user not found. Please run database initialization.', 'error')
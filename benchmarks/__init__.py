@@ -0,0 +1 @@
+"""Performance benchmarks for the Virtual Herbal Garden. Run modules with python -m."""
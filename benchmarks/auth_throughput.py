@@ -0,0 +1,108 @@
+"""
+Login throughput benchmark for the password hashing pool.
+
+Runs a login storm (concurrent password verifications) against
+PasswordHasher at several pool sizes and reports logins/sec, together
+with the latency of a small CPU-bound "page render" running alongside it,
+which shows whether the storm starves the rest of the process.
+
+    python -m benchmarks.auth_throughput --pool-sizes 0,1,2,4 --duration 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hasher import PasswordHasher, HasherBusyError
+
+
+def _render_probe():
+    # Stand-in for a cheap catalogue page: pure-Python work under the GIL
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+
+def run_storm(pool_size, method, concurrency, duration):
+    hasher = PasswordHasher()
+    hasher.configure(method=method, workers=pool_size)
+    pwhash = hasher.hash('correct horse battery staple')
+    hasher.verify(pwhash, 'warm-up')  # spin up pool processes before timing
+
+    stop = threading.Event()
+    counts = [0] * concurrency
+    rejected = [0] * concurrency
+    probe_latencies = []
+
+    def login_worker(slot):
+        while not stop.is_set():
+            try:
+                hasher.verify(pwhash, 'correct horse battery staple')
+                counts[slot] += 1
+            except HasherBusyError:
+                rejected[slot] += 1
+
+    def probe_worker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            _render_probe()
+            probe_latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(concurrency)]
+    threads.append(threading.Thread(target=probe_worker))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+
+    probe_latencies.sort()
+    return {
+        'pool_size': pool_size,
+        'concurrency': concurrency,
+        'method': method,
+        'logins': sum(counts),
+        'rejected': sum(rejected),
+        'logins_per_sec': round(sum(counts) / elapsed, 2),
+        'page_probe_ms_p50': round(statistics.median(probe_latencies), 3) if probe_latencies else None,
+        'page_probe_ms_p95': round(probe_latencies[int(len(probe_latencies) * 0.95) - 1], 3) if probe_latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', default=f'0,1,2,{os.cpu_count() or 1}',
+                        help='comma separated pool sizes; 0 hashes inline in the request thread')
+    parser.add_argument('--method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),
+                        help='Werkzeug KDF spec, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000')
+    parser.add_argument('--concurrency', type=int, default=16, help='simultaneous login threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per pool size')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in sorted({int(s) for s in args.pool_sizes.split(',') if s.strip()}):
+        result = run_storm(size, args.method, args.concurrency, args.duration)
+        results.append(result)
+        print(f"pool={result['pool_size']:>3}  logins/sec={result['logins_per_sec']:>9.2f}  "
+              f"rejected={result['rejected']:>5}  page p50={result['page_probe_ms_p50']}ms "
+              f"p95={result['page_probe_ms_p95']}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Synthetic catalogue generator for load benchmarks.
+
+Writes a fresh SQLite database with any number of plants, categories,
+users and identifications. Names, Ayurvedic properties and the prose
+fields are drawn from the same vocabulary as the seed data, so search,
+facets and related plants do realistic work. Rows are bulk inserted, then
+init_database() fills the derived tables (property values, binomial keys,
+related plants) exactly as a real deployment would.
+
+    python -m benchmarks.catalogue --plants 100000 --output /tmp/bench/herbs.db
+
+Every generated user's password is "benchmark" (hashed once with a cheap
+PBKDF2 setting, so logging in doesn't dominate route timings). The admin
+is bench_admin; users are bench_user0, bench_user1, ...
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'benchmark'
+BATCH_SIZE = 5000
+
+SYLLABLES = ('ka', 'la', 'ma', 'na', 'ra', 'sa', 'ta', 'va', 'ya', 'sha', 'dha', 'bha', 'gu', 'ki',
+             'mi', 'ni', 'pi', 'ri', 'si', 'ti', 'vi', 'ru', 'tu', 'mu', 'lo', 'no', 'ro', 'so')
+FAMILIES = ('Lamiaceae', 'Solanaceae', 'Zingiberaceae', 'Fabaceae', 'Apiaceae', 'Asteraceae',
+            'Rutaceae', 'Moraceae', 'Piperaceae', 'Acanthaceae', 'Menispermaceae', 'Phyllanthaceae')
+CATEGORY_NAMES = ('Herbs', 'Medicinal Plants', 'Spices', 'Aromatic Plants', 'Fruits', 'Trees',
+                  'Shrubs', 'Climbers', 'Roots', 'Seeds', 'Flowers', 'Leaves', 'Barks', 'Resins')
+
+RASA = ('Madhura', 'Amla', 'Lavana', 'Katu', 'Tikta', 'Kashaya')
+GUNA = ('Laghu', 'Guru', 'Snigdha', 'Ruksha', 'Tikshna', 'Sheeta', 'Ushna', 'Sara')
+VIRYA = ('Ushna', 'Sheeta')
+VIPAKA = ('Madhura', 'Amla', 'Katu')
+DOSHA = ('Balances Vata and Kapha', 'Balances Pitta', 'Balances Kapha', 'Balances Vata',
+         'Balances Vata and Pitta', 'Pacifies Kapha and Pitta', 'Tridoshic')
+
+CONDITIONS = ('cough', 'cold', 'fever', 'stress', 'anxiety', 'insomnia', 'indigestion', 'acidity',
+              'constipation', 'joint pain', 'arthritis', 'inflammation', 'headache', 'asthma',
+              'diabetes', 'skin disorders', 'wounds', 'hair fall', 'liver disorders', 'fatigue',
+              'poor memory', 'urinary infections', 'high blood pressure', 'nausea', 'bronchitis')
+ACTIONS = ('anti-inflammatory', 'antioxidant', 'antimicrobial', 'adaptogenic', 'carminative',
+           'expectorant', 'diuretic', 'hepatoprotective', 'analgesic', 'immunomodulatory',
+           'digestive', 'nervine', 'rejuvenating', 'antispasmodic', 'astringent')
+PARTS = ('leaves', 'roots', 'seeds', 'bark', 'flowers', 'fruit', 'rhizome', 'resin')
+SEASONS = ('Year-round', 'Monsoon', 'Winter', 'Summer', 'Spring')
+WATER = ('Low', 'Moderate', 'High')
+SUN = ('Full sun', 'Partial shade', 'Shade')
+SOIL = ('Sandy, well-draining', 'Loamy', 'Clay', 'Well-draining, loamy', 'Rocky')
+CLIMATE = ('Tropical', 'Subtropical', 'Temperate', 'Arid', 'Tropical and subtropical')
+
+
+def _word(rng, syllables):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def _some(rng, values, low=1, high=3):
+    return rng.sample(values, rng.randint(low, min(high, len(values))))
+
+
+def plant_row(rng, plant_id, genera, user_ids, now):
+    name = _word(rng, rng.randint(2, 4)).capitalize()
+    genus = rng.choice(genera)
+    species = _word(rng, 3)
+    conditions = _some(rng, CONDITIONS, 2, 5)
+    actions = _some(rng, ACTIONS, 2, 4)
+    part = rng.choice(PARTS)
+    created = now - timedelta(minutes=rng.randint(0, 525600))
+    approved = rng.random() >= 0.05
+    return {
+        'id': plant_id,
+        'name': name,
+        'scientific_name': f'{genus} {species}',
+        'binomial_key': f'{genus.lower()} {species}',
+        'family': rng.choice(FAMILIES),
+        'ayurvedic_name': _word(rng, 3).capitalize(),
+        'hindi_name': _word(rng, 2).capitalize(),
+        'sanskrit_name': _word(rng, 3).capitalize(),
+        'common_names': json.dumps([f'{_word(rng, 2).capitalize()} {rng.choice(("Root", "Leaf", "Berry", "Weed"))}']),
+        'rasa': ', '.join(_some(rng, RASA)),
+        'guna': ', '.join(_some(rng, GUNA, 1, 2)),
+        'virya': rng.choice(VIRYA),
+        'vipaka': rng.choice(VIPAKA),
+        'dosha': rng.choice(DOSHA),
+        'description': f'{name} is a {rng.choice(FAMILIES)} herb whose {part} are used for '
+                       f'{conditions[0]} and {conditions[1]} in traditional practice.',
+        'benefits': 'Relieves ' + ', '.join(conditions) + '; ' + ', '.join(actions),
+        'uses': f'{part.capitalize()} taken as decoction or powder for ' + ' and '.join(conditions[:2]),
+        'medicinal_properties': ', '.join(actions).capitalize(),
+        'chemical_constituents': ', '.join(f'{_word(rng, 3)}ine' for _ in range(3)),
+        'pharmacological_actions': ', '.join(actions).capitalize(),
+        'therapeutic_uses': 'Used in ' + ', '.join(conditions),
+        'culinary_uses': f'{part.capitalize()} used in teas' if rng.random() < 0.3 else None,
+        'growing_conditions': f'{rng.choice(SUN)}, {rng.choice(SOIL).lower()} soil',
+        'precautions': 'Avoid during pregnancy' if rng.random() < 0.2 else None,
+        'side_effects': None,
+        'season': rng.choice(SEASONS),
+        'water_requirements': rng.choice(WATER),
+        'sunlight_requirements': rng.choice(SUN),
+        'soil_type': rng.choice(SOIL),
+        'climate': rng.choice(CLIMATE),
+        'user_id': rng.choice(user_ids),
+        'is_approved': approved,
+        'approved_by': user_ids[0] if approved else None,
+        'approved_at': created if approved else None,
+        'created_at': created,
+        'updated_at': created,
+    }
+
+
+def _insert(table, rows):
+    from models import db
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def generate(database, plants=1000, categories=12, users=50, identifications=500, seed=0, app_config=None):
+    """Create `database` (a file path) from scratch; returns the row counts"""
+    from app import create_app, init_database
+    from models import db, User, Plant, Category, PlantIdentification, plant_categories
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    if os.path.exists(database):
+        os.remove(database)
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+    app = create_app({**bench_config(database), **(app_config or {})})
+    with app.app_context():
+        db.create_all()
+
+        password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+        user_rows = [{'id': 1, 'username': 'bench_admin', 'email': 'bench_admin@example.com', 'role': 'admin',
+                      'password_hash': password_hash, 'first_name': 'Bench', 'last_name': 'Admin',
+                      'is_active': True, 'created_at': now}]
+        user_rows += [{'id': i + 2, 'username': f'bench_user{i}', 'email': f'bench_user{i}@example.com',
+                       'role': 'user', 'password_hash': password_hash, 'first_name': 'Bench',
+                       'last_name': f'User {i}', 'is_active': True, 'created_at': now}
+                      for i in range(users)]
+        _insert(User.__table__, user_rows)
+        user_ids = [row['id'] for row in user_rows]
+
+        names = list(CATEGORY_NAMES) + [f'Group {i}' for i in range(max(0, categories - len(CATEGORY_NAMES)))]
+        _insert(Category.__table__, [{'id': i + 1, 'name': name, 'description': f'{name} of the garden',
+                                      'created_at': now} for i, name in enumerate(names[:categories])])
+
+        genera = sorted({_word(rng, 3).capitalize() for _ in range(max(10, plants // 50))})
+        plant_rows = [plant_row(rng, i + 1, genera, user_ids, now) for i in range(plants)]
+        _insert(Plant.__table__, plant_rows)
+        if categories:
+            _insert(plant_categories, [{'plant_id': plant_id, 'category_id': category_id}
+                                       for plant_id in range(1, plants + 1)
+                                       for category_id in rng.sample(range(1, categories + 1),
+                                                                     rng.randint(1, min(3, categories)))])
+
+        _insert(PlantIdentification.__table__, [
+            {'image_filename': 'benchmark.jpg', 'identified_species': plant['scientific_name'],
+             'confidence': round(rng.uniform(0.3, 0.99), 3), 'suggested_plant_id': plant['id'],
+             'user_id': rng.choice(user_ids), 'created_at': now - timedelta(minutes=rng.randint(0, 43200))}
+            for plant in (rng.choice(plant_rows) for _ in range(identifications if plant_rows else 0))
+        ])
+        db.session.commit()
+
+    # Derived tables: property values, synonyms, related plants
+    init_database(app)
+    return {'plants': plants, 'categories': categories, 'users': len(user_rows),
+            'identifications': identifications if plants else 0}
+
+
+def bench_config(database):
+    """App config that keeps every cache and log of a benchmark next to its database"""
+    root, _ = os.path.splitext(os.path.abspath(database))
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(database)}',
+        'PASSWORD_HASH_WORKERS': 0,
+        'ASSETS_AUTO_BUILD': False,
+        'SYMPTOM_INDEX_PATH': f'{root}.symptom_index.bin',
+        'SEMANTIC_INDEX_DIR': f'{root}.semantic',
+        'PROFILER_DIR': f'{root}.profiles',
+        'SLOW_QUERY_LOG': f'{root}.slow_queries.log',
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='SQLite database file to create (replaced if it exists)')
+    parser.add_argument('--plants', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--identifications', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = generate(args.output, args.plants, args.categories, args.users, args.identifications, args.seed)
+    print(f"{counts['plants']} plants, {counts['categories']} categories, {counts['users']} users, "
+          f"{counts['identifications']} identifications in {time.perf_counter() - started:.1f}s -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
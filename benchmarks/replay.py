@@ -0,0 +1,235 @@
+"""
+Replay captured traffic against a running instance and diff latencies.
+
+Reads the JSONL files written by traffic_capture.py, replays the GET and
+HEAD requests in their original order against --base-url, at the
+original pace (--speed 1), faster (--speed 10) or back to back
+(--speed 0), and compares latency per endpoint with the capture, or with
+an earlier replay when --compare is given:
+
+    python -m benchmarks.replay instance/traffic --base-url http://127.0.0.1:5000 \\
+        --login admin=bench_admin:benchmark --login user=bench_user0:benchmark \\
+        --output /tmp/replay-new.json --compare /tmp/replay-old.json
+
+Captured durations are measured inside the server and replayed ones at the
+client, so compare two replays of the same capture for a release check.
+Requests captured for a role are sent from a session logged in with that
+role's --login credentials, or anonymously if none is given. POSTs are
+never replayed because their bodies are not captured.
+"""
+import argparse
+import glob
+import heapq
+import http.client
+import json
+import math
+import os
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+REPLAYABLE = ('GET', 'HEAD')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(1, math.ceil(fraction * len(values))) - 1]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 0.50), 3),
+        'p95': round(percentile(values, 0.95), 3),
+        'p99': round(percentile(values, 0.99), 3),
+        'mean': round(sum(values) / len(values), 3),
+    }
+
+
+def load_capture(paths):
+    """Captured records from files or directories, oldest first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, 'traffic.*.jsonl*')))
+        else:
+            files.append(path)
+
+    streams = []
+    for name in sorted(files):
+        with open(name, encoding='utf-8') as f:
+            records = []
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by rotation or a crash
+        streams.append(sorted(records, key=lambda record: record['ts']))
+    return list(heapq.merge(*streams, key=lambda record: record['ts']))
+
+
+class Session:
+    """A keep-alive connection that carries one role's login cookie"""
+
+    def __init__(self, base_url, credentials=None):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=60)
+        self.headers = {}
+        if credentials:
+            username, password = credentials
+            body = urlencode({'username': username, 'password': password})
+            self.connection.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = self.connection.getresponse()
+            response.read()
+            cookies = [value.split(';', 1)[0] for name, value in response.getheaders() if name.lower() == 'set-cookie']
+            self.headers['Cookie'] = '; '.join(cookies)
+
+    def request(self, method, target):
+        self.connection.request(method, target, headers=self.headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+
+def replay(records, base_url, speed, concurrency, logins):
+    """Send records at their captured offsets / speed; returns per-record results"""
+    records = [record for record in records if record['method'] in REPLAYABLE]
+    if not records:
+        return []
+    results = [None] * len(records)
+    next_index = [0]
+    lock = threading.Lock()
+    first_ts = records[0]['ts']
+    started = time.perf_counter()
+
+    def worker():
+        sessions = {}
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if i >= len(records):
+                return
+            record = records[i]
+            if speed > 0:
+                delay = (record['ts'] - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            role = record.get('role', 'anonymous')
+            session = sessions.get(role)
+            if session is None:
+                session = sessions[role] = Session(base_url, logins.get(role))
+            target = record['path'] + (f"?{record['query']}" if record.get('query') else '')
+            sent = time.perf_counter()
+            try:
+                status = session.request(record['method'], target)
+            except (OSError, http.client.HTTPException):
+                sessions.pop(role, None)
+                status = None
+            results[i] = {
+                'endpoint': record['endpoint'],
+                'status': status,
+                'expected_status': record['status'],
+                'latency_ms': (time.perf_counter() - sent) * 1000,
+                'lag_ms': max(0.0, (sent - started) - (record['ts'] - first_ts) / speed) * 1000 if speed > 0 else 0.0,
+            }
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def by_endpoint(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(item['endpoint'], []).append(item[key])
+    return {endpoint: summarize(values) for endpoint, values in groups.items()}
+
+
+def diff(current, baseline):
+    """{endpoint: {baseline, current, p50/p95/p99 ratio}} for endpoints in both"""
+    report = {}
+    for endpoint in sorted(set(current) & set(baseline)):
+        new, old = current[endpoint], baseline[endpoint]
+        report[endpoint] = {
+            'baseline': old,
+            'current': new,
+            'ratio': {q: round(new[q] / old[q], 3) if old[q] else None for q in ('p50', 'p95', 'p99')},
+        }
+    return report
+
+
+def _parse_logins(values):
+    logins = {}
+    for value in values or ():
+        role, _, credentials = value.partition('=')
+        username, _, password = credentials.partition(':')
+        logins[role] = (username, password)
+    return logins
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', nargs='+', help='capture files or TRAFFIC_CAPTURE_DIR directories')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--speed', type=float, default=1.0, help='1 = original pace, 0 = as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--login', action='append', metavar='ROLE=USER:PASSWORD',
+                        help='credentials for requests captured with ROLE (repeatable)')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--compare', help='earlier --output file to diff against instead of the capture')
+    parser.add_argument('--output', help='write the replay summary as JSON')
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.capture)[:args.limit]
+    started = time.perf_counter()
+    results = [r for r in replay(records, args.base_url, args.speed, args.concurrency, _parse_logins(args.login)) if r]
+    elapsed = time.perf_counter() - started
+
+    current = by_endpoint(results, 'latency_ms')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['endpoints']
+        baseline_name = args.compare
+    else:
+        baseline = by_endpoint([r for r in records if r['method'] in REPLAYABLE], 'duration_ms')
+        baseline_name = 'capture (server-side)'
+
+    mismatched = sum(1 for r in results if r['status'] != r['expected_status'])
+    summary = {
+        'meta': {
+            'base_url': args.base_url,
+            'speed': args.speed,
+            'concurrency': args.concurrency,
+            'requests': len(results),
+            'skipped': len(records) - len(results),
+            'elapsed_s': round(elapsed, 3),
+            'status_mismatches': mismatched,
+            'lag_ms': summarize([r['lag_ms'] for r in results]),
+            'baseline': baseline_name,
+        },
+        'endpoints': current,
+        'diff': diff(current, baseline),
+    }
+
+    print(f"{len(results)} requests in {elapsed:.1f}s, {mismatched} with a different status; vs {baseline_name}:")
+    for endpoint, row in summary['diff'].items():
+        ratio = row['ratio']
+        print(f"  {endpoint:<24} p50 {row['baseline']['p50']:>9} -> {row['current']['p50']:>9} ms "
+              f"(x{ratio['p50']})  p95 x{ratio['p95']}  p99 x{ratio['p99']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
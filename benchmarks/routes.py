@@ -0,0 +1,294 @@
+"""
+Route-level load benchmark.
+
+Drives every page and API route against a catalogue database, in process
+through the Flask test client and over HTTP through a real Waitress
+server on a local port, and reports throughput and p50/p95/p99 latency
+per route:
+
+    python -m benchmarks.catalogue --plants 100000 --output /tmp/bench/herbs.db
+    python -m benchmarks.routes --database /tmp/bench/herbs.db --output /tmp/bench/results.json
+
+Each route is warmed up first (so lazily built indexes aren't timed), then
+hit by --concurrency threads for --duration seconds. Login-only pages use
+the generated bench_user0 / bench_admin accounts. Any status code other
+than the one a route normally returns counts as an error.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.catalogue import PASSWORD, bench_config
+
+# name, path, who is signed in, expected status. {plant_id}, {category_id}
+# and {term} rotate through values sampled from the database.
+ROUTES = [
+    ('index', '/', None, 200),
+    ('index_search', '/?q={term}', None, 200),
+    ('index_category', '/?category={category_id}', None, 200),
+    ('index_facets', '/?rasa=Katu&virya=Ushna', None, 200),
+    ('index_admin', '/', 'admin', 200),
+    ('plant_detail', '/plant/{plant_id}', None, 200),
+    ('categories', '/categories', None, 200),
+    ('category_plants', '/category/{category_id}', None, 200),
+    ('add_plant', '/add-plant', 'user', 200),
+    ('identify_plant', '/identify-plant', 'user', 200),
+    ('user_dashboard', '/user/dashboard', 'user', 200),
+    ('admin_dashboard', '/admin/dashboard', 'admin', 200),
+    ('login_page', '/login', None, 200),
+    ('api_plants', '/api/plants', None, 200),
+    ('api_plant_detail', '/api/plant/{plant_id}', None, 200),
+    ('api_categories', '/api/categories', None, 200),
+    ('api_search', '/api/search?q={term}', None, 200),
+    ('api_search_facets', '/api/search?q={term}&facets=1', None, 200),
+    ('api_search_symptom', '/api/search?q=cough+and+fever&mode=symptom', None, 200),
+    ('api_search_semantic', '/api/search?q=herbs+to+calm+the+mind&mode=semantic', None, 200),
+    ('api_suggest', '/api/suggest?q={prefix}', None, 200),
+    ('api_did_you_mean', '/api/did-you-mean?q={typo}', None, 200),
+]
+
+USERNAMES = {'user': 'bench_user0', 'admin': 'bench_admin'}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    return values[max(1, math.ceil(fraction * len(values))) - 1]
+
+
+def sample_values(app, count=200):
+    """Plant ids, category ids and search terms that exist in the database"""
+    from models import Plant, Category
+
+    with app.app_context():
+        plants = (Plant.query.filter_by(is_approved=True)
+                  .with_entities(Plant.id, Plant.name).order_by(Plant.id).limit(count * 10).all())
+        step = max(1, len(plants) // count)
+        plants = plants[::step][:count] or [(1, 'tulsi')]
+        categories = [row.id for row in Category.query.with_entities(Category.id)] or [1]
+    names = [name.lower() for _, name in plants]
+    return {
+        'plant_id': [plant_id for plant_id, _ in plants],
+        'category_id': categories,
+        'term': [name[:max(3, len(name) - 1)] for name in names],
+        'prefix': [name[:3] for name in names],
+        'typo': [name[:1] + name[2:] if len(name) > 3 else name for name in names],
+    }
+
+
+class Rotator:
+    def __init__(self, values):
+        self.values = values
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def path(self, template):
+        with self._lock:
+            i = self._next
+            self._next += 1
+        return template.format(**{key: values[i % len(values)] for key, values in self.values.items()})
+
+
+# Transports: each returns a callable (path) -> status code, one per thread
+
+class TestClientTransport:
+    name = 'test_client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def client(self, role):
+        client = self.app.test_client()
+        if role:
+            client.post('/login', data={'username': USERNAMES[role], 'password': PASSWORD})
+        return lambda path: client.get(path).status_code
+
+    def close(self):
+        pass
+
+
+class WaitressTransport:
+    name = 'waitress'
+
+    def __init__(self, app, threads):
+        from waitress import create_server
+
+        self.server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+        self.port = self.server.effective_port
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='benchmark-waitress', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        # server.run(), but one poll at a time so close() can stop it
+        server = self.server
+        while not self.stopping.is_set():
+            server.asyncore.loop(timeout=server.adj.asyncore_loop_timeout, map=server._map,
+                                 use_poll=server.adj.asyncore_use_poll, count=1)
+
+    def client(self, role):
+        # One keep-alive connection per client thread, like a browser tab
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {}
+        if role:
+            body = urlencode({'username': USERNAMES[role], 'password': PASSWORD})
+            connection.request('POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = connection.getresponse()
+            response.read()
+            cookies = [value.split(';', 1)[0] for name, value in response.getheaders() if name.lower() == 'set-cookie']
+            headers['Cookie'] = '; '.join(cookies)
+
+        def get(path):
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        return get
+
+    def close(self):
+        # Closing sockets under a running select() fails with EBADF; stop the loop first
+        self.server.task_dispatcher.shutdown()
+        self.stopping.set()
+        self.server.pull_trigger()
+        self.thread.join()
+        self.server.asyncore.close_all(self.server._map)
+
+
+def run_route(transport, rotator, route, concurrency, duration, warmup):
+    name, template, role, expected = route
+    clients = [transport.client(role) for _ in range(concurrency)]
+    for _ in range(warmup):
+        clients[0](rotator.path(template))
+
+    latencies = [[] for _ in clients]
+    statuses = [{} for _ in clients]
+    deadline = time.perf_counter() + duration
+
+    def worker(slot):
+        get = clients[slot]
+        while time.perf_counter() < deadline:
+            path = rotator.path(template)
+            started = time.perf_counter()
+            status = get(path)
+            latencies[slot].append(time.perf_counter() - started)
+            statuses[slot][status] = statuses[slot].get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(t * 1000 for slot in latencies for t in slot)
+    counts = {}
+    for slot in statuses:
+        for status, n in slot.items():
+            counts[str(status)] = counts.get(str(status), 0) + n
+    return {
+        'route': name,
+        'path': template,
+        'role': role,
+        'transport': transport.name,
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'errors': len(timings) - counts.get(str(expected), 0),
+        'statuses': counts,
+        'throughput_rps': round(len(timings) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(sum(timings) / len(timings), 3) if timings else None,
+            'p50': round(percentile(timings, 0.50), 3) if timings else None,
+            'p95': round(percentile(timings, 0.95), 3) if timings else None,
+            'p99': round(percentile(timings, 0.99), 3) if timings else None,
+            'max': round(timings[-1], 3) if timings else None,
+        },
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='SQLite file made by benchmarks.catalogue')
+    parser.add_argument('--transports', default='test_client,waitress', help='test_client and/or waitress')
+    parser.add_argument('--routes', help='comma separated route names (default: all)')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads per route')
+    parser.add_argument('--waitress-threads', type=int, default=8, help='Waitress worker threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per route and transport')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per route first')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from models import Plant
+
+    if not os.path.exists(args.database):
+        parser.error(f'{args.database} does not exist; create it with python -m benchmarks.catalogue')
+    app = create_app(bench_config(args.database))
+    with app.app_context():
+        plant_count = Plant.query.count()
+    rotator = Rotator(sample_values(app))
+
+    wanted = set(args.routes.split(',')) if args.routes else None
+    routes = [route for route in ROUTES if wanted is None or route[0] in wanted]
+
+    results = []
+    for transport_name in args.transports.split(','):
+        if transport_name == 'test_client':
+            transport = TestClientTransport(app)
+        elif transport_name == 'waitress':
+            transport = WaitressTransport(app, args.waitress_threads)
+        else:
+            parser.error(f'unknown transport {transport_name!r}')
+        try:
+            for route in routes:
+                result = run_route(transport, rotator, route, args.concurrency, args.duration, args.warmup)
+                results.append(result)
+                latency = result['latency_ms']
+                print(f"{transport.name:<11} {result['route']:<20} {result['throughput_rps']:>9.1f} req/s  "
+                      f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+                      f"errors={result['errors']}", flush=True)
+        finally:
+            transport.close()
+
+    if args.output:
+        report = {
+            'meta': {
+                'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'database': os.path.abspath(args.database),
+                'plants': plant_count,
+                'concurrency': args.concurrency,
+                'waitress_threads': args.waitress_threads,
+                'duration': args.duration,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Keeps in-memory indexes over the plant catalogue in sync with the database.
+
+Indexes subclass PlantIndex and register themselves with `catalogue`. They
+are built lazily from the database on first use, then updated
+incrementally: every committed session that touched Plant rows hands the
+affected ids to each built index. Because each worker process holds its
+own copy, indexes also compare a cheap catalogue version (see
+catalogue_version) every CATALOGUE_SYNC_INTERVAL seconds and rebuild when
+another process changed the catalogue. A commit that changes categories
+themselves (names, deletions) reloads every plant.
+"""
+import json
+import threading
+import time
+import zlib
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, selectinload
+
+from models import db, Plant, Category, plant_categories
+
+NAME_FIELDS = ('name', 'scientific_name', 'hindi_name', 'sanskrit_name', 'ayurvedic_name')
+
+_PENDING_KEY = 'catalogue_changes'
+
+
+def parse_common_names(value):
+    """Plant.common_names is a JSON list in the seed data, free text from forms"""
+    if not value:
+        return []
+    try:
+        names = json.loads(value)
+    except (TypeError, ValueError):
+        names = value.split(',')
+    if isinstance(names, str):
+        names = [names]
+    if isinstance(names, dict):
+        names = list(names.values())
+    return [str(n).strip() for n in names if n and str(n).strip()]
+
+
+def plant_names(plant):
+    """Yield (field, value) for every name a plant is known by"""
+    for field in NAME_FIELDS:
+        value = getattr(plant, field)
+        if value and value.strip():
+            yield field, value.strip()
+    for value in parse_common_names(plant.common_names):
+        yield 'common_names', value
+
+
+def load_plants(ids=None):
+    """
+    Load plants (with categories) through a private session, so it is safe
+    to call from commit hooks. The returned objects are detached.
+    """
+    with Session(db.engine, expire_on_commit=False) as session:
+        query = session.query(Plant).options(selectinload(Plant.categories))
+        if ids is not None:
+            if not ids:
+                return []
+            query = query.filter(Plant.id.in_(list(ids)))
+        return query.all()
+
+
+def catalogue_version():
+    """
+    A JSON-friendly list that changes with any plant, category or
+    plant-category link: plant count and latest updated_at, a checksum of
+    the (small) category table, and a count and checksum of the links,
+    since moving a plant between categories doesn't touch Plant.updated_at
+    """
+    with Session(db.engine) as session:
+        count, updated = session.query(func.count(Plant.id), func.max(Plant.updated_at)).one()
+        categories = session.query(Category.id, Category.name).order_by(Category.id).all()
+        links, link_sum = session.query(
+            func.count(),
+            func.coalesce(func.sum(plant_categories.c.plant_id * 1000003 + plant_categories.c.category_id), 0),
+        ).select_from(plant_categories).one()
+    category_key = zlib.crc32(json.dumps([list(row) for row in categories]).encode('utf-8'))
+    return [count, str(updated), category_key, links, link_sum]
+
+
+class PlantIndex:
+    """
+    Base class for in-memory catalogue indexes.
+
+    Subclasses implement clear() and add(plant)/remove(plant_id); they only
+    ever see approved plants unless they set include_pending. Callers run
+    queries inside `with index.reading():` after ensure_fresh(), which builds
+    or resyncs the index when needed.
+    """
+
+    include_pending = False
+    # Also receive apply_changes() before the first build
+    track_unbuilt = False
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._version = None
+        self._checked_at = 0.0
+        catalogue.register(self)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def add(self, plant):
+        raise NotImplementedError
+
+    def remove(self, plant_id):
+        raise NotImplementedError
+
+    def after_update(self):
+        """Called (under the index lock) after every rebuild or batch of changes"""
+
+    def reading(self):
+        return self._lock
+
+    @property
+    def built(self):
+        return self._built
+
+    def rebuild(self, plants=None):
+        plants = load_plants() if plants is None else plants
+        with self._lock:
+            self.clear()
+            for plant in plants:
+                if plant.is_approved or self.include_pending:
+                    self.add(plant)
+            self._built = True
+            self._checked_at = time.monotonic()
+            self._version = catalogue_version()
+            self.after_update()
+
+    def apply_changes(self, plants, deleted_ids, version=None):
+        with self._lock:
+            if not self._built:
+                return
+            for plant_id in deleted_ids:
+                self.remove(plant_id)
+            for plant in plants:
+                self.remove(plant.id)
+                if plant.is_approved or self.include_pending:
+                    self.add(plant)
+            # Our own commits shouldn't trigger a resync
+            self._version = version if version is not None else catalogue_version()
+            self.after_update()
+
+    def ensure_fresh(self):
+        if not self._built:
+            self.rebuild()
+            return
+        interval = catalogue.sync_interval
+        if interval is None or time.monotonic() - self._checked_at < interval:
+            return
+        self._checked_at = time.monotonic()
+        if catalogue_version() != self._version:
+            self.rebuild()
+
+
+class Catalogue:
+    """Session hooks that feed committed Plant changes to registered indexes."""
+
+    def __init__(self, app=None):
+        self.indexes = []
+        self.sync_interval = 30.0
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOGUE_SYNC_INTERVAL', 30.0)
+        interval = app.config['CATALOGUE_SYNC_INTERVAL']
+        self.sync_interval = float(interval) if interval is not None else None
+        app.extensions['catalogue'] = self
+
+        if not self._listening:
+            event.listen(db.session, 'after_flush', self._after_flush)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+            self._listening = True
+
+    def register(self, index):
+        if index not in self.indexes:
+            self.indexes.append(index)
+
+    def _after_flush(self, session, flush_context):
+        changed, deleted, categories = session.info.setdefault(_PENDING_KEY, (set(), set(), set()))
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Plant) and obj.id is not None:
+                changed.add(obj.id)
+        for obj in session.deleted:
+            if isinstance(obj, Plant) and obj.id is not None:
+                deleted.add(obj.id)
+        # Only the category's own columns; adding a plant to one is a Plant change
+        for obj in session.dirty:
+            if isinstance(obj, Category) and session.is_modified(obj, include_collections=False):
+                categories.add(obj.id)
+        for obj in session.deleted:
+            if isinstance(obj, Category):
+                categories.add(obj.id)
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        changed, deleted, categories = pending
+        changed -= deleted
+        targets = [index for index in self.indexes if index.built or index.track_unbuilt]
+        if not targets or not (changed or deleted or categories):
+            return
+        if categories:
+            # A renamed or deleted category touches plants the session never loaded
+            plants = load_plants()
+        else:
+            plants = load_plants(changed)
+        # Computed once for every index
+        version = catalogue_version()
+        for index in targets:
+            index.apply_changes(plants, deleted, version)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING_KEY, None)
+
+
+catalogue = Catalogue()
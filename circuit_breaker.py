@@ -0,0 +1,103 @@
+"""
+Circuit breaker for calls to external services.
+
+Calls are recorded in a rolling window of `window` seconds. Once it holds
+at least `min_calls` calls and either `failure_ratio` of them failed or
+`slow_call_ratio` of them took longer than `slow_call` seconds, the
+circuit opens: allow() returns False for `open_seconds`, so callers fail
+fast or fall back instead of tying up a worker thread on a service that
+is down. Slow calls are counted separately from failures, and the default
+ratio of 1.0 only trips when every call in the window was slow, so a slow
+but answering service isn't cut off by the odd slow call. After that it
+is half-open: `half_open_probes` calls are let through, and the circuit
+closes when they all succeed or opens again on the first failure.
+
+State changes are exported as upstream_circuit_state (0 closed,
+1 half-open, 2 open) and upstream_circuit_transitions_total.
+"""
+import collections
+import threading
+import time
+
+from metrics import metrics
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+
+class CircuitBreaker:
+    def __init__(self, name, window=60.0, min_calls=10, failure_ratio=0.5, slow_call=None,
+                 slow_call_ratio=1.0, open_seconds=30.0, half_open_probes=1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.slow_call_ratio = slow_call_ratio
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._calls = collections.deque()  # (monotonic time, failed, slow)
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        metrics.circuit_state(name, CLOSED, changed=False)
+
+    def allow(self):
+        """Whether a call may go ahead now; every allowed call must be record()ed"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    return False
+                self._probes += 1
+            return True
+
+    def record(self, ok, seconds):
+        """Outcome of an allowed call: ok is False for errors the service is to blame for"""
+        failed = not ok
+        slow = self.slow_call is not None and seconds > self.slow_call
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                return  # a call that started before the circuit opened
+
+            self._calls.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            while self._calls and now - self._calls[0][0] > self.window:
+                _, old_failed, old_slow = self._calls.popleft()
+                self._failures -= old_failed
+                self._slow -= old_slow
+            calls = len(self._calls)
+            if calls >= self.min_calls and (self._failures >= self.failure_ratio * calls
+                                            or self._slow >= self.slow_call_ratio * calls):
+                self._open(now)
+
+    def _open(self, now):
+        self._opened_at = now
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        self._calls.clear()
+        self._failures = 0
+        self._slow = 0
+        self._probes = 0
+        self._probe_successes = 0
+        metrics.circuit_state(self.name, state)
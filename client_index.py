@@ -0,0 +1,136 @@
+"""
+Client-side search index.
+
+Writes a compact JSON snapshot of the approved catalogue (names in every
+script, search keys, categories and thumbnail URL) to
+static/dist/search/plants.<hash>.json, precompressed like the other dist
+assets and served with the same immutable caching. Pages advertise the
+current file in a <meta name="search-index"> tag and script.js filters it
+locally, so typeahead needs no round trip. A new file is only written when
+the content changes, i.e. when approvals or plant names change.
+
+    python client_index.py   # regenerate outside the web process
+"""
+import glob
+import hashlib
+import json
+import os
+
+from flask import url_for
+
+from assets import DIST_DIR, precompress
+from catalogue import PlantIndex, NAME_FIELDS, parse_common_names, plant_names
+from transliterate import skeleton, to_latin
+
+SEARCH_DIR = 'search'
+FORMAT_VERSION = 1
+KEEP_OLD_FILES = 3
+
+FIELDS = ['id'] + list(NAME_FIELDS) + ['common_names', 'keys', 'categories', 'image']
+
+
+class ClientSearchIndex(PlantIndex):
+    def __init__(self, app=None):
+        self.entries = {}
+        self.filename = None
+        self.static_folder = None
+        self.static_url_path = '/static'
+        super().__init__()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.static_url_path = app.static_url_path
+        app.extensions['client_search_index'] = self
+        app.add_template_global(self.url, 'search_index_url')
+
+    def clear(self):
+        self.entries = {}
+
+    def add(self, plant):
+        keys = set()
+        for field, value in plant_names(plant):
+            keys.add(to_latin(value))
+            keys.add(skeleton(value))
+        keys.discard('')
+
+        image = plant.image_filename
+        if image and not image.startswith('http'):
+            image = f'{self.static_url_path}/images/plants/{image}'
+
+        self.entries[plant.id] = [
+            plant.id,
+            *[getattr(plant, field) or '' for field in NAME_FIELDS],
+            parse_common_names(plant.common_names),
+            ' '.join(sorted(keys)),
+            sorted(category.name for category in plant.categories),
+            image or '',
+        ]
+
+    def remove(self, plant_id):
+        self.entries.pop(plant_id, None)
+
+    def after_update(self):
+        if self.static_folder is not None:
+            self.write()
+
+    def payload(self):
+        categories = sorted({name for entry in self.entries.values() for name in entry[-2]})
+        category_ids = {name: i for i, name in enumerate(categories)}
+        plants = []
+        for plant_id in sorted(self.entries):
+            entry = list(self.entries[plant_id])
+            entry[-2] = [category_ids[name] for name in entry[-2]]
+            plants.append(entry)
+        return {'format': FORMAT_VERSION, 'fields': FIELDS, 'categories': categories, 'plants': plants}
+
+    def write(self):
+        body = json.dumps(self.payload(), ensure_ascii=False, separators=(',', ':'))
+        digest = hashlib.sha256(body.encode('utf-8')).hexdigest()[:12]
+        filename = f'{DIST_DIR}/{SEARCH_DIR}/plants.{digest}.json'
+        if filename == self.filename:
+            return filename
+
+        path = os.path.join(self.static_folder, filename)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(body)
+            os.replace(tmp, path)
+            precompress(path)
+        self.filename = filename
+        self._prune()
+        return filename
+
+    def url(self):
+        """URL of the current index file (for templates)"""
+        self.ensure_fresh()
+        return url_for('static', filename=self.filename) if self.filename else None
+
+    def _prune(self):
+        # Keep a few recent versions for pages rendered just before a change
+        pattern = os.path.join(self.static_folder, DIST_DIR, SEARCH_DIR, 'plants.*.json')
+        current = os.path.join(self.static_folder, self.filename)
+        old = sorted((p for p in glob.glob(pattern) if p != current), key=os.path.getmtime, reverse=True)
+        for path in old[KEEP_OLD_FILES:]:
+            for variant in (path, path + '.gz', path + '.br'):
+                try:
+                    os.remove(variant)
+                except OSError:
+                    pass
+
+
+client_search_index = ClientSearchIndex()
+
+
+if __name__ == '__main__':
+    from app import create_app
+    # The instance app.py initialised, not this __main__ module's copy
+    from client_index import client_search_index
+
+    app = create_app()
+    with app.app_context():
+        client_search_index.rebuild()
+        print(client_search_index.filename)
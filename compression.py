@@ -0,0 +1,208 @@
+"""
+Response compression.
+
+Dynamic responses (HTML pages, /api/* JSON) are gzip- or Brotli-encoded on
+the fly when the client accepts it and the body is large enough to be
+worth the CPU. Static files are never compressed per request: if the asset
+build left a .br/.gz sibling next to the file (see assets.precompress) that
+sibling is served as-is, otherwise the file goes out unchanged.
+
+Brotli support needs the optional `Brotli` package; without it only gzip
+is negotiated.
+"""
+import gzip
+import mimetypes
+import os
+
+from werkzeug.utils import send_file
+
+from metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def accepted_encodings(header):
+    """Parse an Accept-Encoding header into the set of codings with q > 0"""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(header, available=('br', 'gzip')):
+    accepted = accepted_encodings(header)
+    for coding in available:
+        if coding == 'br' and brotli is None:
+            continue
+        if coding in accepted or '*' in accepted:
+            return coding
+    return None
+
+
+def compress(data, coding, gzip_level=6, brotli_quality=4):
+    if coding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """WSGI middleware negotiating Content-Encoding for app responses."""
+
+    def __init__(self, wsgi_app, static_folder=None, static_url_path='/static',
+                 min_size=500, max_size=8 * 1024 * 1024, gzip_level=6,
+                 brotli_quality=4, immutable_url=None, immutable_cache_control=None):
+        self.wsgi_app = wsgi_app
+        self.static_folder = static_folder
+        self.static_prefix = static_url_path.rstrip('/') + '/'
+        self.min_size = min_size
+        self.max_size = max_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.immutable_url = immutable_url
+        self.immutable_cache_control = immutable_cache_control
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        accept = environ.get('HTTP_ACCEPT_ENCODING', '')
+
+        if self.static_folder and path.startswith(self.static_prefix):
+            response = self._precompressed(environ, path, accept)
+            if accept:
+                metrics.cache_result('static_precompressed', response is not None)
+            if response is not None:
+                return response(environ, start_response)
+            # Plain static file: never recompressed per request
+            return self.wsgi_app(environ, start_response)
+
+        coding = choose_encoding(accept)
+        if coding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        captured = {}
+        chunks = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return chunks.append
+
+        app_iter = self.wsgi_app(environ, capture)
+        try:
+            chunks.extend(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        status, headers = captured['status'], captured['headers']
+        body = b''.join(chunks)
+
+        if self._should_compress(status, headers, len(body)):
+            body = compress(body, coding, self.gzip_level, self.brotli_quality)
+            headers = [(k, v) for k, v in headers if k.lower() not in ('content-length', 'etag')]
+            headers.append(('Content-Encoding', coding))
+            headers.append(('Content-Length', str(len(body))))
+            headers = self._add_vary(headers)
+
+        start_response(status, headers, captured.get('exc_info'))
+        return [body]
+
+    def _should_compress(self, status, headers, size):
+        if not status.startswith('200') or size < self.min_size or size > self.max_size:
+            return False
+        lowered = {k.lower(): v for k, v in headers}
+        if 'content-encoding' in lowered:
+            return False
+        if 'no-transform' in lowered.get('cache-control', ''):
+            return False
+        content_type = lowered.get('content-type', '').split(';')[0].strip()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _precompressed(self, environ, path, accept):
+        relative = path[len(self.static_prefix):]
+        source = os.path.normpath(os.path.join(self.static_folder, relative))
+        if not source.startswith(os.path.abspath(self.static_folder) + os.sep):
+            return None
+
+        for coding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if coding not in accepted_encodings(accept):
+                continue
+            variant = source + suffix
+            if not os.path.isfile(variant):
+                continue
+            mimetype = mimetypes.guess_type(source)[0] or 'application/octet-stream'
+            response = send_file(variant, environ, mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = coding
+            response.vary.add('Accept-Encoding')
+            if self.immutable_url and self.immutable_url.match(path):
+                response.headers['Cache-Control'] = self.immutable_cache_control
+            return response
+        return None
+
+    @staticmethod
+    def _add_vary(headers):
+        for i, (key, value) in enumerate(headers):
+            if key.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers[i] = (key, f'{value}, Accept-Encoding')
+                return headers
+        headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+
+class Compression:
+    """Installs CompressionMiddleware around app.wsgi_app."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESSION_MAX_SIZE', 8 * 1024 * 1024)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4)
+        if not app.config['COMPRESSION_ENABLED']:
+            return
+
+        from assets import IMMUTABLE_CACHE_CONTROL, immutable_url_pattern
+
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            static_folder=app.static_folder,
+            static_url_path=app.static_url_path,
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            max_size=app.config['COMPRESSION_MAX_SIZE'],
+            gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY'],
+            immutable_url=immutable_url_pattern(app.static_url_path),
+            immutable_cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+        app.extensions['compression'] = self
+
+
+compression = Compression()
@@ -1,5 +1,7 @@
 from flask import Flask
 from models import db, User, Plant, Category
+from plant_properties import property_tables
+from taxonomy import taxonomy
 import json
 
 app = Flask(__name__)
@@ -8,10 +10,13 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
 db.init_app(app)
+property_tables.init_app(app)  # seeded plants get their normalized property rows
+taxonomy.init_app(app)  # ...and their canonical binomial keys
 
 def seed_database():
     with app.app_context():
         db.create_all()  # ensures tables exist
+        taxonomy.migrate()  # binomial key column and synonym table
 
         # 🧑‍🌾 Demo users
         if not User.query.first():
@@ -0,0 +1,154 @@
+"""
+Near-duplicate detection for plant submissions.
+
+Each name, scientific name and Hindi name is transliterated to Latin and
+broken into character trigrams ("tulsi" -> "  t", " tu", "tul", ...). A
+64-value MinHash signature of every trigram set is split into 16 bands of
+4, and names sharing any band bucket are candidates; candidates are then
+verified with exact trigram Jaccard similarity across all name fields, so
+"Tulasi" matches "Tulsi" and "तुलसी". Plants whose canonical binomial keys
+are equal always count as duplicates. The bands put the LSH threshold,
+(1/16)^(1/4), at THRESHOLD: near-misses rarely become candidates, and
+pairs at 0.6 or more are still found over 99% of the time.
+
+for_plant() results are cached until the index next changes, so the admin
+dashboard doesn't redo the search for every pending plant on each view.
+
+Unlike the search indexes this one includes pending plants, so repeated
+submissions of the same herb are caught before either is approved.
+"""
+import re
+import zlib
+
+import numpy as np
+
+from catalogue import PlantIndex
+from taxonomy import binomial_key
+from transliterate import to_latin
+
+FIELDS = ('name', 'scientific_name', 'hindi_name')
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.5
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.int64)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def trigrams(text):
+    text = _NON_WORD.sub(' ', to_latin(text or '')).strip()
+    if not text:
+        return frozenset()
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def minhash(shingles):
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) & 0x7fffffff for s in shingles),
+                         dtype=np.int64, count=len(shingles))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DuplicateIndex(PlantIndex):
+    include_pending = True
+
+    def __init__(self):
+        self.clear()
+        super().__init__()
+
+    def clear(self):
+        self.shingles = {}       # plant_id -> [trigram sets]
+        self.buckets = {}        # (band, values) -> plant ids
+        self.plant_buckets = {}  # plant_id -> bucket keys, for removal
+        self.keys = {}           # binomial key -> plant ids
+        self.plant_keys = {}
+        self._matches = {}       # (plant_id, limit) -> for_plant() result
+
+    def add(self, plant):
+        sets = [s for s in (trigrams(getattr(plant, field)) for field in FIELDS) if s]
+        buckets = set()
+        for shingles in sets:
+            buckets.update(self._bands(minhash(shingles)))
+        for bucket in buckets:
+            self.buckets.setdefault(bucket, set()).add(plant.id)
+        self.shingles[plant.id] = sets
+        self.plant_buckets[plant.id] = buckets
+
+        key = binomial_key(plant.scientific_name)
+        if key:
+            self.keys.setdefault(key, set()).add(plant.id)
+            self.plant_keys[plant.id] = key
+
+    def remove(self, plant_id):
+        self.shingles.pop(plant_id, None)
+        for bucket in self.plant_buckets.pop(plant_id, ()):
+            members = self.buckets.get(bucket)
+            if members is not None:
+                members.discard(plant_id)
+                if not members:
+                    del self.buckets[bucket]
+        key = self.plant_keys.pop(plant_id, None)
+        if key is not None:
+            self.keys[key].discard(plant_id)
+            if not self.keys[key]:
+                del self.keys[key]
+
+    @staticmethod
+    def _bands(signature):
+        return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+    def find(self, name=None, scientific_name=None, hindi_name=None, exclude=None, limit=5):
+        """[(plant_id, similarity)] of likely duplicates, most similar first"""
+        sets = [s for s in (trigrams(name), trigrams(scientific_name), trigrams(hindi_name)) if s]
+        key = binomial_key(scientific_name)
+        signatures = [minhash(shingles) for shingles in sets]
+
+        self.ensure_fresh()
+        with self.reading():
+            candidates = set(self.keys.get(key, ())) if key else set()
+            exact = set(candidates)
+            for signature in signatures:
+                for bucket in self._bands(signature):
+                    candidates |= self.buckets.get(bucket, set())
+            candidates.discard(exclude)
+
+            results = []
+            for plant_id in candidates:
+                if plant_id in exact:
+                    score = 1.0
+                else:
+                    score = max((jaccard(a, b) for a in sets for b in self.shingles.get(plant_id, ())),
+                                default=0.0)
+                if score >= THRESHOLD:
+                    results.append((plant_id, score))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def after_update(self):
+        self._matches = {}
+
+    def for_plant(self, plant, limit=5):
+        self.ensure_fresh()
+        # Under the lock, so a change can't land between find() and caching
+        with self.reading():
+            key = (plant.id, limit)
+            found = self._matches.get(key)
+            if found is None:
+                found = self._matches[key] = self.find(plant.name, plant.scientific_name, plant.hindi_name,
+                                                       exclude=plant.id, limit=limit)
+        return list(found)
+
+
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,149 @@
+"""
+Faceted filtering over approved plants using bitsets.
+
+Each approved plant gets a dense slot number; for every (facet, value)
+pair we keep a Python int whose bit `slot` is set when the plant has that
+value. A query ORs the bitsets of the selected values within a facet (or
+ANDs them with mode='all'), ANDs across facets, and counts each value of
+each facet against the other facets' selections with int.bit_count(), so
+filters and their live counts never touch SQL.
+"""
+from collections import namedtuple
+
+from catalogue import PlantIndex
+from plant_properties import PROPERTY_FIELDS, parse_property
+
+FACETS = PROPERTY_FIELDS + ('category',)
+
+FacetResult = namedtuple('FacetResult', 'ids counts')
+
+
+def parse_filters(args):
+    """
+    {facet: [values]} from request args (repeated and/or comma separated),
+    each value canonicalised by parse_property, so "bitter" selects Tikta
+    """
+    filters = {}
+    for facet in FACETS:
+        if facet == 'category':
+            continue  # the category filter keeps its own query parameter
+        values = []
+        for raw in args.getlist(facet):
+            for value in raw.split(','):
+                for canonical in parse_property(facet, value):
+                    if canonical not in values:
+                        values.append(canonical)
+        if values:
+            filters[facet] = values
+    return filters
+
+
+class FacetIndex(PlantIndex):
+    def __init__(self):
+        self.clear()
+        super().__init__()
+
+    def clear(self):
+        self.slots = {}           # plant_id -> slot
+        self.plant_ids = []       # slot -> plant_id (None when free)
+        self.free_slots = []
+        self.all_bits = 0
+        self.bits = {facet: {} for facet in FACETS}
+        self.plant_values = {}    # plant_id -> [(facet, value)]
+
+    def add(self, plant):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.plant_ids[slot] = plant.id
+        else:
+            slot = len(self.plant_ids)
+            self.plant_ids.append(plant.id)
+        self.slots[plant.id] = slot
+        bit = 1 << slot
+        self.all_bits |= bit
+
+        values = [(field, value) for field in PROPERTY_FIELDS
+                  for value in parse_property(field, getattr(plant, field))]
+        values += [('category', str(category.id)) for category in plant.categories]
+        for facet, value in values:
+            bucket = self.bits[facet]
+            bucket[value] = bucket.get(value, 0) | bit
+        self.plant_values[plant.id] = values
+
+    def remove(self, plant_id):
+        slot = self.slots.pop(plant_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        self.all_bits &= mask
+        for facet, value in self.plant_values.pop(plant_id, ()):
+            bucket = self.bits[facet]
+            remaining = bucket.get(value, 0) & mask
+            if remaining:
+                bucket[value] = remaining
+            else:
+                bucket.pop(value, None)
+        self.plant_ids[slot] = None
+        self.free_slots.append(slot)
+
+    def _ids_to_bits(self, ids):
+        bits = 0
+        for plant_id in ids:
+            slot = self.slots.get(plant_id)
+            if slot is not None:
+                bits |= 1 << slot
+        return bits
+
+    def _bits_to_ids(self, bits):
+        ids = []
+        while bits:
+            low = bits & -bits
+            ids.append(self.plant_ids[low.bit_length() - 1])
+            bits ^= low
+        return ids
+
+    def _facet_mask(self, facet, values, mode):
+        bucket = self.bits.get(facet, {})
+        if mode == 'all':
+            mask = self.all_bits
+            for value in values:
+                mask &= bucket.get(value, 0)
+            return mask
+        mask = 0
+        for value in values:
+            mask |= bucket.get(value, 0)
+        return mask
+
+    def query(self, filters=None, candidates=None, mode='any', with_counts=True):
+        """
+        Filter approved plants. `filters` maps facet -> selected values,
+        `candidates` optionally restricts the universe (e.g. to text-search
+        hits). Returns FacetResult(ids, counts) where counts[facet][value]
+        is how many plants would match if that value were also selected.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if f in FACETS and v}
+        self.ensure_fresh()
+        with self.reading():
+            base = self.all_bits if candidates is None else self._ids_to_bits(candidates)
+            masks = {facet: self._facet_mask(facet, values, mode) for facet, values in filters.items()}
+
+            result = base
+            for mask in masks.values():
+                result &= mask
+
+            counts = {}
+            if with_counts:
+                for facet in FACETS:
+                    # Counts for a facet ignore that facet's own selection
+                    others = base
+                    for other, mask in masks.items():
+                        if other != facet:
+                            others &= mask
+                    counts[facet] = {
+                        value: (bits & others).bit_count()
+                        for value, bits in sorted(self.bits[facet].items())
+                    }
+            return FacetResult(self._bits_to_ids(result), counts)
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,295 @@
+"""
+Local stand-in for the Plant.id v2 API.
+
+Serves POST /v2/identify and POST /v2/health_assessment with canned
+responses in Plant.id's format, so the identification path can be run
+and load tested over real HTTP with no network:
+
+    python fake_plant_id.py --port 5100 --latency lognormal:250:0.6 --error-rate 0.02 --rate-limit 5
+    PLANT_ID_API_URL=http://127.0.0.1:5100/v2 python serve.py
+
+The same image always gets the same answer (the species is picked from the
+image's digest). Upstream behaviour is configurable, at startup or at
+runtime through POST /_fake/config (JSON with the same keys):
+
+    latency      "none", "fixed:MS", "uniform:MIN:MAX", "normal:MEAN:SD" or
+                 "lognormal:MEDIAN:SIGMA", in milliseconds
+    error_rate   fraction of requests answered 500/502/503
+    rate_limit   requests per second before 429 (token bucket, 0 = off)
+    burst        bucket size for rate_limit
+    max_inflight concurrent requests before 429 (0 = off)
+
+GET /_fake/stats returns request counts by endpoint and outcome.
+"""
+import argparse
+import base64
+import hashlib
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import Flask, jsonify, request
+
+# (scientific name, authority, common names, synonyms, family, genus)
+SPECIES = [
+    ('Ocimum tenuiflorum', 'L.', ['Holy Basil', 'Tulsi'], ['Ocimum sanctum'], 'Lamiaceae', 'Ocimum'),
+    ('Withania somnifera', '(L.) Dunal', ['Ashwagandha', 'Winter Cherry'], [], 'Solanaceae', 'Withania'),
+    ('Azadirachta indica', 'A.Juss.', ['Neem', 'Margosa'], ['Melia azadirachta'], 'Meliaceae', 'Azadirachta'),
+    ('Curcuma longa', 'L.', ['Turmeric', 'Haldi'], ['Curcuma domestica'], 'Zingiberaceae', 'Curcuma'),
+    ('Aloe vera', '(L.) Burm.f.', ['Aloe', 'Ghritkumari'], ['Aloe barbadensis'], 'Asphodelaceae', 'Aloe'),
+    ('Phyllanthus emblica', 'L.', ['Amla', 'Indian Gooseberry'], ['Emblica officinalis'], 'Phyllanthaceae', 'Phyllanthus'),
+    ('Bacopa monnieri', '(L.) Wettst.', ['Brahmi', 'Water Hyssop'], [], 'Plantaginaceae', 'Bacopa'),
+    ('Tinospora cordifolia', '(Willd.) Miers', ['Giloy', 'Guduchi'], [], 'Menispermaceae', 'Tinospora'),
+    ('Zingiber officinale', 'Roscoe', ['Ginger', 'Adrak'], [], 'Zingiberaceae', 'Zingiber'),
+    ('Mentha arvensis', 'L.', ['Mint', 'Pudina'], [], 'Lamiaceae', 'Mentha'),
+]
+
+DISEASES = [
+    ('water deficiency', 'Abiotic', 'Leaves wilt and curl when the soil dries out.', 'Water deeply once the top soil is dry.'),
+    ('leaf spot', 'Fungi', 'Brown spots with yellow halos caused by fungal infection.', 'Remove affected leaves; avoid wetting foliage.'),
+    ('powdery mildew', 'Fungi', 'White powdery growth on leaf surfaces.', 'Improve air circulation; apply neem oil.'),
+    ('aphids', 'Animalia', 'Small sap-sucking insects clustered on new growth.', 'Spray with soapy water or neem oil.'),
+    ('nutrient deficiency', 'Abiotic', 'Yellowing between leaf veins.', 'Feed with balanced organic fertilizer.'),
+]
+
+DEFAULTS = {
+    'latency': 'none',
+    'error_rate': 0.0,
+    'rate_limit': 0.0,
+    'burst': 10,
+    'max_inflight': 0,
+}
+
+
+def parse_latency(spec):
+    """A function returning one latency sample in seconds"""
+    kind, _, args = (spec or 'none').partition(':')
+    try:
+        params = [float(value) for value in args.split(':') if value]
+    except ValueError:
+        params = []
+    if kind == 'none':
+        return lambda: 0.0
+    if kind == 'fixed' and len(params) == 1:
+        return lambda: params[0] / 1000
+    if kind == 'uniform' and len(params) == 2:
+        return lambda: random.uniform(params[0], params[1]) / 1000
+    if kind == 'normal' and len(params) == 2:
+        return lambda: max(0.0, random.gauss(params[0], params[1])) / 1000
+    if kind == 'lognormal' and len(params) == 2 and params[0] > 0:
+        mu, sigma = math.log(params[0] / 1000), params[1]
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f'bad latency spec {spec!r}')
+
+
+class Behaviour:
+    """Injected latency, failures and throttling, changeable at runtime"""
+
+    def __init__(self, **settings):
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.inflight = 0
+        self.configure(**{**DEFAULTS, **settings})
+
+    def configure(self, **settings):
+        with self._lock:
+            for key, value in settings.items():
+                if key not in DEFAULTS:
+                    raise ValueError(f'unknown setting {key!r}')
+                if key == 'latency':
+                    self.sample_latency = parse_latency(value)
+                setattr(self, key, value if key == 'latency' else float(value))
+            self.tokens = self.burst
+            self.refilled = time.monotonic()
+
+    def settings(self):
+        return {key: getattr(self, key) for key in DEFAULTS}
+
+    def admit(self):
+        """None to proceed, or (status, message) to reject with"""
+        with self._lock:
+            if self.max_inflight and self.inflight >= self.max_inflight:
+                return 429, 'Too many concurrent requests'
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1:
+                    return 429, 'Rate limit exceeded'
+                self.tokens -= 1
+            self.inflight += 1
+        return None
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def count(self, endpoint, outcome):
+        with self._lock:
+            key = f'{endpoint} {outcome}'
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+def _digest(images):
+    digest = hashlib.sha256()
+    for image in images:
+        digest.update(image.encode('utf-8') if isinstance(image, str) else bytes(image))
+    return digest.digest()
+
+
+def _suggestions(seed, details):
+    rng = random.Random(seed)
+    picks = rng.sample(SPECIES, 3)
+    probabilities = sorted((rng.uniform(0.02, 0.3) for _ in picks[1:]), reverse=True)
+    probabilities.insert(0, rng.uniform(0.55, 0.97))
+    suggestions = []
+    for (name, authority, common, synonyms, family, genus), probability in zip(picks, probabilities):
+        plant_details = {
+            'common_names': common,
+            'url': f"https://en.wikipedia.org/wiki/{name.replace(' ', '_')}",
+            'name_authority': f'{name} {authority}',
+            'wiki_description': {'value': f'{name} is a species in the family {family}.',
+                                 'citation': 'https://en.wikipedia.org', 'license_name': 'CC BY-SA 3.0'},
+            'taxonomy': {'kingdom': 'Plantae', 'family': family, 'genus': genus},
+            'synonyms': synonyms,
+            'scientific_name': name,
+            'structured_name': {'genus': genus.lower(), 'species': name.split()[1]},
+        }
+        suggestions.append({
+            'id': rng.randrange(10 ** 8),
+            'plant_name': name,
+            'plant_details': {key: value for key, value in plant_details.items()
+                              if key in details or key in ('scientific_name', 'structured_name')},
+            'probability': round(probability, 4),
+            'confirmed': False,
+            'similar_images': [],
+        })
+    return suggestions
+
+
+def _envelope(payload, digest):
+    now = time.time()
+    return {
+        'id': int.from_bytes(digest[:4], 'big'),
+        'custom_id': None,
+        'meta_data': {'date': datetime.utcnow().date().isoformat(), 'datetime': datetime.utcnow().isoformat()},
+        'uploaded_datetime': now,
+        'finished_datetime': now,
+        'images': [{'file_name': f'{digest.hex()[:32]}.jpg', 'url': f'https://plant.id/media/images/{digest.hex()[:32]}.jpg'}],
+        'modifiers': payload.get('modifiers', []),
+        'secret': uuid.uuid4().hex[:16],
+        'fail_cause': None,
+        'countable': True,
+        'feedback': None,
+        'is_plant_probability': 0.99,
+        'is_plant': True,
+    }
+
+
+def create_fake_app(**settings):
+    app = Flask(__name__)
+    behaviour = app.extensions['fake_plant_id'] = Behaviour(**settings)
+
+    def handle(endpoint, build):
+        if not request.headers.get('Api-Key'):
+            behaviour.count(endpoint, 'unauthorized')
+            return jsonify(error='API key missing'), 401
+        payload = request.get_json(silent=True) or {}
+        images = payload.get('images')
+        if not images or not isinstance(images, list):
+            behaviour.count(endpoint, 'bad_request')
+            return jsonify(error='images: at least one base64 image is required'), 400
+
+        rejected = behaviour.admit()
+        if rejected is not None:
+            behaviour.count(endpoint, 'throttled')
+            status, message = rejected
+            return jsonify(error=message), status, {'Retry-After': '1'}
+        try:
+            time.sleep(behaviour.sample_latency())
+            if random.random() < behaviour.error_rate:
+                behaviour.count(endpoint, 'error')
+                status = random.choice((500, 502, 503))
+                return jsonify(error='Injected upstream failure'), status
+            for image in images:
+                base64.b64decode(image, validate=True)
+            digest = _digest(images)
+            body = _envelope(payload, digest)
+            body.update(build(payload, digest))
+            behaviour.count(endpoint, 'ok')
+            return jsonify(body)
+        except ValueError:
+            behaviour.count(endpoint, 'bad_request')
+            return jsonify(error='images must be base64 encoded'), 400
+        finally:
+            behaviour.release()
+
+    @app.post('/v2/identify')
+    def identify():
+        return handle('identify', lambda payload, digest: {
+            'suggestions': _suggestions(digest, set(payload.get('plant_details') or ())),
+        })
+
+    @app.post('/v2/health_assessment')
+    def health_assessment():
+        def build(payload, digest):
+            rng = random.Random(digest)
+            healthy = rng.random()
+            picks = rng.sample(DISEASES, 3)
+            diseases = []
+            for (name, classification, description, treatment), probability in zip(
+                    picks, sorted((rng.uniform(0.05, 0.8) for _ in picks), reverse=True)):
+                diseases.append({
+                    'name': name,
+                    'probability': round(probability, 4),
+                    'redundant': False,
+                    'disease_details': {'local_name': name, 'cause': None, 'common_names': [name],
+                                        'classification': [classification], 'description': description,
+                                        'treatment': {'biological': [treatment]}},
+                })
+            return {'health_assessment': {'is_healthy': healthy > 0.5,
+                                          'is_healthy_probability': round(healthy, 4),
+                                          'diseases': diseases}}
+        return handle('health_assessment', build)
+
+    @app.route('/_fake/config', methods=['GET', 'POST'])
+    def config():
+        if request.method == 'POST':
+            try:
+                behaviour.configure(**(request.get_json(silent=True) or {}))
+            except (TypeError, ValueError) as e:
+                return jsonify(error=str(e)), 400
+        return jsonify(behaviour.settings())
+
+    @app.get('/_fake/stats')
+    def stats():
+        return jsonify(inflight=behaviour.inflight, requests=behaviour.stats)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--threads', type=int, default=32, help='Waitress threads (upper bound on concurrency)')
+    parser.add_argument('--latency', default=DEFAULTS['latency'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULTS['error_rate'])
+    parser.add_argument('--rate-limit', type=float, default=DEFAULTS['rate_limit'])
+    parser.add_argument('--burst', type=float, default=DEFAULTS['burst'])
+    parser.add_argument('--max-inflight', type=int, default=DEFAULTS['max_inflight'])
+    args = parser.parse_args(argv)
+
+    from waitress import serve
+
+    app = create_fake_app(latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit,
+                          burst=args.burst, max_inflight=args.max_inflight)
+    print(f'Fake Plant.id API on http://{args.host}:{args.port}/v2', flush=True)
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam
+
+from models import db, User
+
+
+class LastLoginBuffer:
+    """
+    Write-behind buffer for User.last_login.
+
+    Logins only record the timestamp in memory; a background thread writes
+    all pending timestamps in one batched UPDATE every few seconds (and at
+    shutdown), so bursts of logins don't queue up on the SQLite write lock.
+
+    The shutdown flush is an atexit hook, and atexit doesn't run when a
+    process is killed by a signal's default action. serve.py turns SIGTERM
+    and SIGINT into a normal exit; under another server, make sure SIGTERM
+    does the same or call shutdown() yourself.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 5.0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._owner_pid = None
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LAST_LOGIN_FLUSH_INTERVAL', 5.0)
+        self.app = app
+        self.flush_interval = float(app.config['LAST_LOGIN_FLUSH_INTERVAL'])
+        app.extensions['last_login_buffer'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def record(self, user_id, when=None):
+        """Remember that user_id logged in; the newest timestamp wins."""
+        when = when or datetime.utcnow()
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or when > previous:
+                self._pending[user_id] = when
+        self._ensure_worker()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write all buffered timestamps in a single executemany UPDATE."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        table = User.__table__
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam('b_user_id'))
+            .values(last_login=bindparam('b_last_login'))
+        )
+        rows = [{'b_user_id': user_id, 'b_last_login': when} for user_id, when in batch.items()]
+
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(stmt, rows)
+        except Exception as e:
+            # Put the batch back so the next flush retries it, without
+            # overwriting anything newer that arrived in the meantime.
+            with self._lock:
+                for user_id, when in batch.items():
+                    current = self._pending.get(user_id)
+                    if current is None or when > current:
+                        self._pending[user_id] = when
+            self.app.logger.warning('Failed to flush last_login updates: %s', e)
+            return 0
+
+        return len(rows)
+
+    def shutdown(self):
+        if self.app is None or self._owner_pid not in (None, os.getpid()):
+            return
+        self._wakeup.set()
+        self.flush()
+
+    def _ensure_worker(self):
+        # Started lazily and per-process so forked workers get their own thread
+        pid = os.getpid()
+        if self._thread is not None and self._owner_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._owner_pid == pid and self._thread.is_alive():
+                return
+            self._owner_pid = pid
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='last-login-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._wakeup.wait(self.flush_interval):
+            self.flush()
+
+
+last_login_buffer = LastLoginBuffer()
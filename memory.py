@@ -0,0 +1,144 @@
+"""
+Memory instrumentation for admins.
+
+/admin/memory is a tracemalloc report for the worker that serves it: the
+top allocation sites right now, and what grew since a baseline snapshot
+taken from the same page. Tracing is only switched on from there (or by
+MEMORY_TRACE_AT_START), since it slows every allocation while it runs.
+
+Independently, a MEMORY_SAMPLE_RATE fraction of requests is traced on its
+own to record the route's peak allocation above where it started. One
+request is sampled at a time; allocations made by other threads during
+that window are counted too, so the figures are upper bounds. Peaks also
+feed the request_peak_allocated_bytes histogram in /metrics.
+"""
+import os
+import random
+import threading
+import tracemalloc
+
+from flask import g, request
+
+from metrics import metrics
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _site(traceback):
+    frame = traceback[0]
+    path = frame.filename
+    return f'{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}:{frame.lineno}'
+
+
+class MemoryTracker:
+    def __init__(self, app=None):
+        self.sample_rate = 0.0
+        self.frames = 1
+        self.baseline = None
+        self.routes = {}   # endpoint -> [samples, total peak bytes, max peak bytes]
+        self._tracing = False
+        self._sample_lock = threading.RLock()  # an admin may toggle tracing from a sampled request
+        self._routes_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEMORY_SAMPLE_RATE', 0.01)
+        app.config.setdefault('MEMORY_TRACE_FRAMES', 1)
+        app.config.setdefault('MEMORY_TRACE_AT_START', False)
+        self.sample_rate = float(app.config['MEMORY_SAMPLE_RATE'])
+        self.frames = int(app.config['MEMORY_TRACE_FRAMES'])
+        app.extensions['memory_tracker'] = self
+        if app.config['MEMORY_TRACE_AT_START']:
+            self.start()
+        if self.sample_rate > 0:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    # Tracing controlled from the report
+
+    @property
+    def tracing(self):
+        return self._tracing and tracemalloc.is_tracing()
+
+    def start(self):
+        with self._sample_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._tracing = True
+
+    def stop(self):
+        with self._sample_lock:
+            self._tracing = False
+            self.baseline = None
+            tracemalloc.stop()
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+    def set_baseline(self):
+        self.baseline = self.snapshot() if self.tracing else None
+
+    def report(self, limit=25):
+        """Top allocation sites and growth since the baseline, if tracing"""
+        if not self.tracing:
+            return None
+        snapshot = self.snapshot()
+        report = {
+            'current': tracemalloc.get_traced_memory()[0],
+            'overhead': tracemalloc.get_tracemalloc_memory(),
+            'top': [{'site': _site(stat.traceback), 'size': stat.size, 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:limit]],
+            'growth': None,
+        }
+        if self.baseline is not None:
+            diffs = [diff for diff in snapshot.compare_to(self.baseline, 'lineno') if diff.size_diff > 0]
+            report['growth'] = [{'site': _site(diff.traceback), 'size': diff.size,
+                                 'size_diff': diff.size_diff, 'count_diff': diff.count_diff}
+                                for diff in diffs[:limit]]
+        return report
+
+    def route_peaks(self):
+        """[(endpoint, samples, mean peak, max peak)] heaviest first"""
+        with self._routes_lock:
+            rows = [(endpoint, n, total / n, worst) for endpoint, (n, total, worst) in self.routes.items()]
+        return sorted(rows, key=lambda row: -row[3])
+
+    # Per-request sampling
+
+    def _before_request(self):
+        if random.random() >= self.sample_rate or not self._sample_lock.acquire(blocking=False):
+            return
+        owned = not tracemalloc.is_tracing()
+        if owned:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        g._memory_sample = (owned, tracemalloc.get_traced_memory()[0])
+
+    def _teardown_request(self, exc):
+        sample = g.pop('_memory_sample', None)
+        if sample is None:
+            return
+        owned, start = sample
+        try:
+            peak = max(tracemalloc.get_traced_memory()[1] - start, 0)
+            if owned and not self._tracing:
+                tracemalloc.stop()
+        finally:
+            self._sample_lock.release()
+
+        endpoint = request.endpoint or 'unmatched'
+        with self._routes_lock:
+            stats = self.routes.setdefault(endpoint, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += peak
+            stats[2] = max(stats[2], peak)
+        metrics.observe_allocation(endpoint, peak)
+
+
+memory_tracker = MemoryTracker()
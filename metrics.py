@@ -0,0 +1,508 @@
+"""
+Prometheus metrics.
+
+GET /metrics serves the text exposition format (version 0.0.4):
+
+    http_requests_total / http_request_duration_seconds   per endpoint
+    db_queries_total / db_query_duration_seconds          every SQL statement
+    db_queries_per_request                                per endpoint
+    template_render_duration_seconds                      per template
+    upstream_request_duration_seconds                     Plant.id calls
+    upstream_circuit_state / _transitions_total           see circuit_breaker.py
+    cache_requests_total{cache, result="hit"|"miss"}      hit ratio = hit / sum
+    request_peak_allocated_bytes                          sampled, see memory.py
+    process_resident_memory_bytes                         RSS of this worker
+
+Collection only runs while something is scraping: the first scrape turns
+the hooks on and they switch themselves off again after
+METRICS_IDLE_TIMEOUT seconds without one, so an unscraped deployment
+pays a single attribute check per request and per SQL statement.
+METRICS_ENABLED=0 removes the hooks entirely; METRICS_TOKEN, when set,
+must be sent as a bearer token.
+
+Each process records into its own registry. When METRICS_MULTIPROC_DIR
+is set (`serve.py --processes` sets it for its workers), every process
+also writes a snapshot of its registry to a file there once a second while
+collection is on, and a scrape merges all of them: counters and
+histograms are summed, so totals don't jump between workers and a dead
+worker's counts are kept; gauges get a pid label and are dropped once
+their process has exited. A scrape also touches a file there, so every
+worker turns collection on, not only the one that accepted it.
+"""
+import atexit
+import bisect
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BYTE_BUCKETS = tuple(2 ** n for n in range(14, 31, 2))  # 16 KiB .. 1 GiB
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def resident_memory():
+    """Resident set size of this process in bytes, or None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # No /proc (macOS): fall back to the peak, reported in bytes there
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # EPERM: it exists, it just isn't ours
+    return True
+
+
+def _resident_memory_samples():
+    rss = resident_memory()
+    return [((), rss)] if rss is not None else []
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @property
+    def merged_labelnames(self):
+        return self.labelnames
+
+    def render(self, merged=None):
+        """This process's samples, or `merged` ones from every process (see merge())"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        if merged is None:
+            with self._lock:
+                items = sorted(self._values.items())
+            lines.extend(self._render_samples(items, self.labelnames))
+        else:
+            lines.extend(self._render_samples(sorted(merged.items()), self.merged_labelnames))
+        return lines
+
+    def _render_samples(self, items, labelnames):
+        return [f'{self.name}{_labels(labelnames, labels)} {_number(value)}' for labels, value in items]
+
+    def snapshot(self):
+        """JSON-friendly [[labels, value]] for another process to merge"""
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def merge(self, merged, samples, pid, alive):
+        for labels, value in samples:
+            labels = tuple(labels)
+            merged[labels] = merged.get(labels, 0) + value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    @property
+    def merged_labelnames(self):
+        return self.labelnames + ('pid',)
+
+    def refresh(self):
+        if self.function is not None:
+            for labels, value in self.function():
+                self.set(value, *labels)
+
+    def render(self, merged=None):
+        if merged is None:
+            self.refresh()
+        return super().render(merged)
+
+    def snapshot(self):
+        self.refresh()
+        return super().snapshot()
+
+    def merge(self, merged, samples, pid, alive):
+        # A gauge describes one live process; summing them would mean nothing
+        if alive:
+            for labels, value in samples:
+                merged[(*labels, str(pid))] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_samples(self, items, labelnames):
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = _labels(labelnames, labels, [('le', _number(float(bound)))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            suffix = _labels(labelnames, labels)
+            lines.append(f'{self.name}_sum{suffix} {_number(total)}')
+            lines.append(f'{self.name}_count{suffix} {count}')
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(labels), [list(counts), total, count]]
+                    for labels, (counts, total, count) in self._values.items()]
+
+    def merge(self, merged, samples, pid, alive):
+        for labels, (counts, total, count) in samples:
+            labels = tuple(labels)
+            state = merged.get(labels)
+            if state is None:
+                merged[labels] = [list(counts), total, count]
+            else:
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, merged=None):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(None if merged is None else merged.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+
+class Metrics:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.idle_timeout = 300.0
+        self.token = None
+        self.multiproc_dir = None
+        self.write_interval = 1.0
+        self.active = False
+        self._last_scrape = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._owner_pid = None
+        self._scrape_path = None
+        self._snapshot_path = None
+        self._atexit_registered = False
+        self._engine_hooked = False
+        self._signals_hooked = False
+
+        self.registry = Registry()
+        metric = self.registry.register
+        self.requests = metric(Counter(
+            'http_requests_total', 'HTTP requests by endpoint, method and status',
+            ('endpoint', 'method', 'status')))
+        self.request_duration = metric(Histogram(
+            'http_request_duration_seconds', 'Time spent handling a request',
+            ('endpoint', 'method')))
+        self.queries = metric(Counter(
+            'db_queries_total', 'SQL statements executed'))
+        self.query_duration = metric(Histogram(
+            'db_query_duration_seconds', 'SQL statement execution time', buckets=SQL_BUCKETS))
+        self.queries_per_request = metric(Histogram(
+            'db_queries_per_request', 'SQL statements issued while handling one request',
+            ('endpoint',), buckets=COUNT_BUCKETS))
+        self.template_duration = metric(Histogram(
+            'template_render_duration_seconds', 'Jinja template render time', ('template',)))
+        self.upstream_duration = metric(Histogram(
+            'upstream_request_duration_seconds', 'Calls to external APIs',
+            ('service', 'operation', 'outcome')))
+        self.circuit = metric(Gauge(
+            'upstream_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open',
+            ('service',)))
+        self.circuit_transitions = metric(Counter(
+            'upstream_circuit_transitions_total', 'Circuit breaker state changes by new state',
+            ('service', 'state')))
+        self.cache_requests = metric(Counter(
+            'cache_requests_total', 'Cache lookups by cache and result (hit/miss)',
+            ('cache', 'result')))
+        self.allocations = metric(Histogram(
+            'request_peak_allocated_bytes', 'Peak traced allocation of sampled requests',
+            ('endpoint',), buckets=BYTE_BUCKETS))
+        self.resident_memory = metric(Gauge(
+            'process_resident_memory_bytes', 'Resident memory size in bytes',
+            function=_resident_memory_samples))
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_IDLE_TIMEOUT', 300.0)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_MULTIPROC_DIR', None)
+        app.config.setdefault('METRICS_WRITE_INTERVAL', 1.0)
+        self.enabled = bool(app.config['METRICS_ENABLED'])
+        self.idle_timeout = float(app.config['METRICS_IDLE_TIMEOUT'])
+        self.token = app.config['METRICS_TOKEN']
+        self.multiproc_dir = app.config['METRICS_MULTIPROC_DIR']
+        self.write_interval = float(app.config['METRICS_WRITE_INTERVAL'])
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        if self.multiproc_dir:
+            self._scrape_path = os.path.join(self.multiproc_dir, 'last_scrape')
+            if not self._atexit_registered:
+                # A worker's final counts outlive it in its snapshot
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+        if not self._engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            self._engine_hooked = True
+        if not self._signals_hooked:
+            before_render_template.connect(self._before_render)
+            template_rendered.connect(self._after_render)
+            self._signals_hooked = True
+
+    def is_active(self):
+        if self.active and time.monotonic() - self._last_scrape > self.idle_timeout:
+            self.active = False
+        return self.active
+
+    # Recording helpers for other modules; no-ops while nobody scrapes
+
+    def observe_upstream(self, service, operation, outcome, seconds):
+        if self.active:
+            self.upstream_duration.observe(seconds, service, operation, outcome)
+
+    def circuit_state(self, service, state, changed=True):
+        # Recorded even while inactive: it is rare, and a gauge must be right on the first scrape
+        self.circuit.set(CIRCUIT_STATES[state], service)
+        if changed:
+            self.circuit_transitions.inc(service, state)
+
+    def cache_result(self, cache, hit):
+        if self.active:
+            self.cache_requests.inc(cache, 'hit' if hit else 'miss')
+
+    def observe_allocation(self, endpoint, size):
+        if self.active:
+            self.allocations.observe(size, endpoint)
+
+    # Request hooks
+
+    def _before_request(self):
+        if self.multiproc_dir:
+            self._ensure_worker()
+        if self.is_active():
+            g._metrics_start = time.perf_counter()
+            g._metrics_queries = 0
+
+    def _after_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            endpoint = request.endpoint or 'unmatched'
+            self.request_duration.observe(elapsed, endpoint, request.method)
+            self.requests.inc(endpoint, request.method, str(response.status_code))
+            self.queries_per_request.observe(g.pop('_metrics_queries', 0), endpoint)
+        return response
+
+    # SQL hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            conn.info.setdefault('_metrics_start', []).append((context, time.perf_counter()))
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_metrics_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()[1]
+        self.queries.inc()
+        self.query_duration.observe(elapsed)
+        if has_request_context() and '_metrics_queries' in g:
+            g._metrics_queries += 1
+
+    def _handle_error(self, exception_context):
+        # after_cursor_execute never runs for a statement that raised
+        conn = exception_context.connection
+        starts = conn.info.get('_metrics_start') if conn is not None else None
+        if starts and starts[-1][0] is exception_context.execution_context:
+            starts.pop()
+
+    # Template signals
+
+    def _before_render(self, sender, template, context, **extra):
+        if self.active:
+            context['_metrics_render_start'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        start = context.get('_metrics_render_start')
+        if start is not None:
+            self.template_duration.observe(time.perf_counter() - start, template.name or 'string')
+
+    # Multi-process snapshots
+
+    def _ensure_worker(self):
+        # Started lazily and per-process so forked workers get their own thread and file
+        pid = os.getpid()
+        if self._owner_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._owner_pid == pid and self._thread.is_alive():
+                return
+            self._owner_pid = pid
+            # Not just the pid: a reused pid mustn't overwrite a dead worker's counts
+            self._snapshot_path = os.path.join(self.multiproc_dir, f'{pid}-{uuid.uuid4().hex[:8]}.json')
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshots', daemon=True)
+            self._thread.start()
+        # Don't miss this first request if another worker was scraped
+        self._check_scraped()
+
+    def _check_scraped(self):
+        try:
+            age = time.time() - os.path.getmtime(self._scrape_path)
+        except OSError:
+            return
+        if age <= self.idle_timeout:
+            self._last_scrape = max(self._last_scrape, time.monotonic() - age)
+            self.active = True
+
+    def _run(self):
+        while True:
+            time.sleep(self.write_interval)
+            self._check_scraped()
+            if self.is_active():
+                self.write_snapshot()
+
+    def write_snapshot(self):
+        if self._snapshot_path is None or self._owner_pid != os.getpid():
+            return
+        tmp = f'{self._snapshot_path}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'metrics': self.registry.snapshot()}, f)
+            os.replace(tmp, self._snapshot_path)
+        except OSError:
+            pass
+
+    def shutdown(self):
+        if self.active:
+            self.write_snapshot()
+
+    def collect(self):
+        """Samples of every process that wrote a snapshot, merged per metric"""
+        merged = {metric.name: {} for metric in self.registry.metrics}
+        for path in glob.glob(os.path.join(self.multiproc_dir, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = snapshot['pid']
+            alive = _process_alive(pid)
+            for metric in self.registry.metrics:
+                samples = snapshot['metrics'].get(metric.name)
+                if samples:
+                    metric.merge(merged[metric.name], samples, pid, alive)
+        return merged
+
+    # Endpoint
+
+    def view(self):
+        if self.token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied, f'Bearer {self.token}'):
+                return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'})
+        self._last_scrape = time.monotonic()
+        self.active = True
+        if not self.multiproc_dir:
+            return Response(self.registry.render(), content_type=CONTENT_TYPE)
+
+        try:
+            with open(self._scrape_path, 'a'):
+                pass
+            os.utime(self._scrape_path)
+        except OSError:
+            pass
+        self.write_snapshot()
+        return Response(self.registry.render(self.collect()), content_type=CONTENT_TYPE)
+
+
+metrics = Metrics()
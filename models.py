@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from password_hasher import password_hasher
 
 db = SQLAlchemy()
 
@@ -11,6 +11,14 @@ plant_categories = db.Table('plant_categories',
     db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
 )
 
+# Association table for plant -> normalized property values (rasa, dosha, ...)
+plant_property_values = db.Table('plant_property_values',
+    db.Column('plant_id', db.Integer, db.ForeignKey('plant.id'), primary_key=True),
+    db.Column('property_value_id', db.Integer, db.ForeignKey('property_value.id'), primary_key=True),
+    # Lookups go value -> plants, the primary key covers plant -> values
+    db.Index('ix_plant_property_values_value_plant', 'property_value_id', 'plant_id')
+)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -26,10 +34,10 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def is_admin(self):
         return self.role == 'admin'
@@ -65,10 +73,26 @@ class Category(db.Model):
             'plant_count': len(self.plants)
         }
 
+class PropertyValue(db.Model):
+    """One canonical value of a Plant property, e.g. ('rasa', 'Tikta') or ('dosha', 'Pitta')"""
+    id = db.Column(db.Integer, primary_key=True)
+    field = db.Column(db.String(30), nullable=False)
+    value = db.Column(db.String(100), nullable=False)
+    
+    __table_args__ = (db.UniqueConstraint('field', 'value', name='uq_property_value_field_value'),)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'field': self.field,
+            'value': self.value
+        }
+
 class Plant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     scientific_name = db.Column(db.String(100))
+    binomial_key = db.Column(db.String(120), index=True)  # canonical "genus species", see taxonomy.py
     family = db.Column(db.String(100))
     image_filename = db.Column(db.String(200))
     
@@ -124,6 +148,9 @@ class Plant(db.Model):
                                 backref=db.backref('plants', lazy=True))
     author = db.relationship('User', foreign_keys=[user_id], backref=db.backref('plants_added', lazy=True))
     approver = db.relationship('User', foreign_keys=[approved_by], backref=db.backref('plants_approved', lazy=True))
+    # Kept in sync with the text columns above by plant_properties.PropertyTables
+    property_values = db.relationship('PropertyValue', secondary=plant_property_values,
+                                      backref=db.backref('plants', lazy='dynamic'))
     
     def to_dict(self):
         return {
@@ -152,6 +179,23 @@ class Plant(db.Model):
             'is_approved': self.is_approved
         }
 
+class PlantSynonym(db.Model):
+    """Another scientific name for the species whose binomial key is accepted_key"""
+    id = db.Column(db.Integer, primary_key=True)
+    synonym_key = db.Column(db.String(120), nullable=False, index=True)
+    accepted_key = db.Column(db.String(120), nullable=False, index=True)
+    name = db.Column(db.String(200))
+    source = db.Column(db.String(50), default='seed')
+    
+    __table_args__ = (db.UniqueConstraint('synonym_key', 'accepted_key', name='uq_plant_synonym_pair'),)
+
+class RelatedPlant(db.Model):
+    """Precomputed nearest neighbours of an approved plant (see related.py)"""
+    plant_id = db.Column(db.Integer, db.ForeignKey('plant.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    related_plant_id = db.Column(db.Integer, db.ForeignKey('plant.id'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
 class PlantIdentification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     image_filename = db.Column(db.String(200), nullable=False)
@@ -0,0 +1,57 @@
+"""
+Cross-script name lookup.
+
+Maps the search keys of every plant name (see transliterate.search_keys),
+for the whole name and for each of its words, to the plants carrying it.
+A query is reduced to the same keys, so "tulsi", "Tulsi" and "तुलसी" all
+resolve with a handful of dict lookups instead of LIKE scans over every
+name column.
+"""
+from catalogue import PlantIndex, plant_names
+from transliterate import search_keys
+
+
+class NameIndex(PlantIndex):
+    def __init__(self):
+        self.keys = {}
+        self.plant_keys = {}
+        super().__init__()
+
+    def clear(self):
+        self.keys = {}
+        self.plant_keys = {}
+
+    def add(self, plant):
+        keys = set()
+        for field, value in plant_names(plant):
+            keys |= search_keys(value)
+            words = value.split()
+            if len(words) > 1:
+                for word in words:
+                    keys |= search_keys(word)
+        for key in keys:
+            self.keys.setdefault(key, set()).add(plant.id)
+        self.plant_keys[plant.id] = keys
+
+    def remove(self, plant_id):
+        for key in self.plant_keys.pop(plant_id, ()):
+            ids = self.keys.get(key)
+            if ids is not None:
+                ids.discard(plant_id)
+                if not ids:
+                    del self.keys[key]
+
+    def lookup(self, query):
+        """Ids of approved plants with a name matching query in any script"""
+        keys = search_keys(query)
+        if not keys:
+            return set()
+        self.ensure_fresh()
+        matches = set()
+        with self.reading():
+            for key in keys:
+                matches |= self.keys.get(key, set())
+        return matches
+
+
+name_index = NameIndex()
@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when too many hash/verify jobs are already queued."""
+
+
+def default_workers():
+    """
+    An even share of the cores per server process, so serve.py --processes N
+    (WEB_CONCURRENCY=N, 0 meaning one per core) doesn't run cores² KDF workers
+    """
+    cores = os.cpu_count() or 1
+    processes = int(os.getenv('WEB_CONCURRENCY') or 1)
+    if processes <= 0:
+        processes = cores
+    return max(1, cores // processes)
+
+
+def default_start_method():
+    # Forking a multi-threaded server copies locks held by other threads;
+    # forkserver/spawn children start from a clean interpreter instead
+    methods = multiprocessing.get_all_start_methods()
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _hash_password(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _verify_password(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """
+    Runs Werkzeug's password KDF in a bounded process pool.
+
+    The KDF is CPU-bound and holds the GIL, so running it in the request
+    thread caps logins per process and stalls every other request served
+    by the same worker. With PASSWORD_HASH_WORKERS > 0 the work is shipped
+    to a process pool instead; at most PASSWORD_HASH_MAX_PENDING jobs may
+    be in flight, further callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT
+    seconds and then get HasherBusyError. With 0 workers (or before
+    init_app, e.g. when seeding the database) hashing runs inline.
+    The pool is started with PASSWORD_HASH_START_METHOD, forkserver by
+    default, never by forking the threaded server process itself.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.salt_length = 16
+        self.workers = 0
+        self.max_pending = 0
+        self.queue_timeout = 5.0
+        self.start_method = None
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', default_workers())
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', None)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)
+        app.config.setdefault('PASSWORD_HASH_START_METHOD', default_start_method())
+        self.configure(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            salt_length=app.config['PASSWORD_HASH_SALT_LENGTH'],
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+            queue_timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT'],
+            start_method=app.config['PASSWORD_HASH_START_METHOD'],
+        )
+        app.extensions['password_hasher'] = self
+
+    def configure(self, method='scrypt', salt_length=16, workers=0,
+                  max_pending=None, queue_timeout=5.0, start_method=None):
+        self.shutdown()
+        self.method = method
+        self.salt_length = int(salt_length)
+        self.workers = max(0, int(workers))
+        # Default queue depth: a few jobs per worker keeps every core busy
+        # without letting a login storm build an unbounded backlog.
+        self.max_pending = int(max_pending) if max_pending else self.workers * 4
+        self.queue_timeout = float(queue_timeout)
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(self.max_pending) if self.workers else None
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        if not pwhash or password is None:
+            return False
+        return self._run(_verify_password, pwhash, password)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            owner, self._executor_pid = self._executor_pid, None
+        if executor is not None and owner == os.getpid():
+            executor.shutdown(wait=wait)
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        slots = self._slots
+        if not slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusyError('Password hashing queue is full')
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            slots.release()
+
+    def _get_executor(self):
+        # Pools don't survive fork, so each worker process builds its own
+        pid = os.getpid()
+        if self._executor is not None and self._executor_pid == pid:
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._executor_pid != pid:
+                context = multiprocessing.get_context(self.start_method) if self.start_method else None
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._executor_pid = pid
+            return self._executor
+
+
+password_hasher = PasswordHasher()
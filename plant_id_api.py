@@ -1,13 +1,66 @@
 import requests
 import base64
+import collections
+import hashlib
 import os
+import threading
+import time
 from datetime import datetime
 import json
 
+from circuit_breaker import CircuitBreaker
+from metrics import metrics
+
+# Recent successful answers, served for the same image while Plant.id is down
+FALLBACK_CACHE_SIZE = 256
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; callers that arrive while it is in
+    flight wait for it and share its result (or exception)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, function):
+        """
+        (result, shared): shared is True for callers that waited on another's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        
+        try:
+            call['result'] = function()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
 class PlantIdAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url="https://api.plant.id/v2", timeout=15, breaker=None):
         self.api_key = api_key
-        self.base_url = "https://api.plant.id/v2"
+        # Point at `python fake_plant_id.py` to run without the real service
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker("plant.id", slow_call=timeout / 2)
+        self._answers = collections.OrderedDict()
+        self._answers_lock = threading.Lock()
+        self._in_flight = SingleFlight()
         
     def identify_plant(self, image_path, organs=['leaf', 'flower', 'fruit', 'bark']):
         """
@@ -34,30 +87,7 @@ class PlantIdAPI:
                 "organs": organs
             }
             
-            headers = {
-                "Content-Type": "application/json",
-                "Api-Key": self.api_key
-            }
-            
-            # Make API request
-            response = requests.post(
-                f"{self.base_url}/identify",
-                json=data,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'data': response.json(),
-                    'error': None
-                }
-            else:
-                return {
-                    'success': False,
-                    'data': None,
-                    'error': f"API Error: {response.status_code} - {response.text}"
-                }
+            return self._post("identify", data)
                 
         except Exception as e:
             return {
@@ -80,29 +110,7 @@ class PlantIdAPI:
                 "disease_details": ["cause", "common_names", "classification", "description", "treatment"]
             }
             
-            headers = {
-                "Content-Type": "application/json",
-                "Api-Key": self.api_key
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/health_assessment",
-                json=data,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return {
-                    'success': True,
-                    'data': response.json(),
-                    'error': None
-                }
-            else:
-                return {
-                    'success': False,
-                    'data': None,
-                    'error': f"API Error: {response.status_code} - {response.text}"
-                }
+            return self._post("health_assessment", data)
                 
         except Exception as e:
             return {
@@ -111,6 +119,85 @@ class PlantIdAPI:
                 'error': f"Request failed: {str(e)}"
             }
     
+    def _post(self, endpoint, data):
+        """
+        POST to a Plant.id endpoint; concurrent identical requests (same
+        images and options) share a single upstream call
+        """
+        key = (endpoint, hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest())
+        result, shared = self._in_flight.do(key, lambda: self._call(endpoint, data, key))
+        metrics.cache_result("plant_id_in_flight", shared)
+        return result
+    
+    def _call(self, endpoint, data, key):
+        """
+        POST through the circuit breaker, recording latency and outcome
+        """
+        if not self.breaker.allow():
+            metrics.observe_upstream("plant.id", endpoint, "short_circuit", 0.0)
+            return self._fallback(key, "Plant.id is unavailable right now, please try again in a minute")
+        
+        headers = {
+            "Content-Type": "application/json",
+            "Api-Key": self.api_key
+        }
+        
+        start = time.perf_counter()
+        outcome = "exception"
+        upstream_ok = False
+        try:
+            response = requests.post(
+                f"{self.base_url}/{endpoint}",
+                json=data,
+                headers=headers,
+                timeout=self.timeout
+            )
+            outcome = "success" if response.status_code == 200 else "error"
+            # 4xx other than throttling are our request's fault, not an outage
+            upstream_ok = response.status_code < 500 and response.status_code != 429
+        except requests.RequestException as e:
+            return self._fallback(key, f"Request failed: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_upstream("plant.id", endpoint, outcome, elapsed)
+            self.breaker.record(upstream_ok, elapsed)
+        
+        if response.status_code == 200:
+            result = {
+                'success': True,
+                'data': response.json(),
+                'error': None
+            }
+            with self._answers_lock:
+                self._answers[key] = result
+                self._answers.move_to_end(key)
+                if len(self._answers) > FALLBACK_CACHE_SIZE:
+                    self._answers.popitem(last=False)
+            return result
+        error = f"API Error: {response.status_code} - {response.text}"
+        if not upstream_ok:
+            return self._fallback(key, error)
+        return {
+            'success': False,
+            'data': None,
+            'error': error
+        }
+    
+    def _fallback(self, key, error):
+        """
+        The last answer for the same request, or a failure with `error`
+        """
+        with self._answers_lock:
+            cached = self._answers.get(key)
+        metrics.cache_result("plant_id_fallback", cached is not None)
+        if cached is not None:
+            return cached
+        return {
+            'success': False,
+            'data': None,
+            'error': error
+        }
+    
     def parse_identification_results(self, api_response):
         """
         Parse Plant.id API response into structured data
@@ -0,0 +1,224 @@
+"""
+Parsers for the free-text Ayurvedic and growing properties on Plant.
+
+The seed data and the add-plant form store these as prose-ish strings
+("Tikta, Kashaya", "Balances Pitta and Kapha", "Spring-summer",
+"Amla (sour), Kashaya, Madhura", "All except Lavana"). parse_property()
+turns one into a list of canonical values so they can be indexed.
+
+PropertyTables mirrors those values into the normalized property_value /
+plant_property_values tables whenever a plant's text columns change, and
+property_filter()/filter_by_properties() answer "Tikta rasa that pacifies
+Pitta" with indexed joins instead of LIKE scans.
+
+    python plant_properties.py   # migrate: create the tables and backfill
+"""
+import re
+
+from sqlalchemy import event, func, inspect, select
+
+from models import db, Plant, PropertyValue, plant_property_values
+
+PROPERTY_FIELDS = (
+    'rasa', 'guna', 'virya', 'vipaka', 'dosha',
+    'season', 'water_requirements', 'sunlight_requirements', 'climate',
+)
+
+RASAS = ('Madhura', 'Amla', 'Lavana', 'Katu', 'Tikta', 'Kashaya')
+DOSHAS = ('Vata', 'Pitta', 'Kapha')
+
+# Spelling variants and English glosses -> canonical value, per field
+_ALIASES = {
+    'rasa': {
+        'sweet': 'Madhura', 'sour': 'Amla', 'salty': 'Lavana', 'salt': 'Lavana',
+        'pungent': 'Katu', 'bitter': 'Tikta', 'astringent': 'Kashaya', 'kasaya': 'Kashaya',
+    },
+    'guna': {
+        'light': 'Laghu', 'heavy': 'Guru', 'oily': 'Snigdha', 'unctuous': 'Snigdha',
+        'dry': 'Ruksha', 'rooksha': 'Ruksha', 'sharp': 'Tikshna', 'teekshna': 'Tikshna',
+    },
+    'virya': {
+        'sheet': 'Sheeta', 'sita': 'Sheeta', 'shita': 'Sheeta', 'cold': 'Sheeta', 'cooling': 'Sheeta',
+        'usna': 'Ushna', 'hot': 'Ushna', 'heating': 'Ushna', 'warm': 'Ushna',
+    },
+    'vipaka': {'sweet': 'Madhura', 'pungent': 'Katu', 'sour': 'Amla'},
+    'season': {
+        'rainy': 'Monsoon', 'rainy season': 'Monsoon', 'rains': 'Monsoon',
+        'year round': 'Year-round', 'year-round': 'Year-round', 'all year': 'Year-round',
+        'perennial': 'Year-round', 'fall': 'Autumn',
+    },
+    'water_requirements': {'medium': 'Moderate', 'average': 'Moderate'},
+    'sunlight_requirements': {'full sunlight': 'Full sun', 'partial sunlight': 'Partial sun'},
+    'climate': {'sub-tropical': 'Subtropical', 'sub tropical': 'Subtropical'},
+}
+
+_PARENTHETICAL = re.compile(r'\([^)]*\)')
+_SEPARATORS = re.compile(r'\s*(?:,|/|;|&|\band\b|\bor\b)\s*', re.I)
+_DOSHA_WORD = re.compile(r'\b(vata|vaata|pitta|kapha)\b', re.I)
+_INCREASES = re.compile(r'\b(increase|increases|aggravate|aggravates|provoke|provokes)\b', re.I)
+
+
+def _canonical(field, token):
+    token = ' '.join(token.strip(' .').split())
+    if not token:
+        return None
+    aliases = _ALIASES.get(field, {})
+    lowered = token.lower()
+    if lowered in aliases:
+        return aliases[lowered]
+    return token[0].upper() + token[1:].lower()
+
+
+def _parse_rasa(value):
+    if re.search(r'\ball\b', value, re.I):
+        excluded = {_canonical('rasa', t) for t in re.findall(r'except\s+(.*)', value, re.I)
+                    for t in _SEPARATORS.split(t)}
+        return [rasa for rasa in RASAS if rasa not in excluded]
+    return None
+
+
+def _parse_dosha(value):
+    text = value.lower()
+    if 'tridosh' in text or 'all dosha' in text or 'all three' in text:
+        return list(DOSHAS)
+
+    values = []
+    for clause in re.split(r'[;.]|\bbut\b', value, flags=re.I):
+        effect = 'Increases' if _INCREASES.search(clause) else None
+        for match in _DOSHA_WORD.finditer(clause):
+            dosha = 'Vata' if match.group(1).lower().startswith('va') else match.group(1).title()
+            values.append(f'{effect} {dosha}' if effect else dosha)
+    return values
+
+
+def parse_property(field, value):
+    """Canonical values for one property string, without duplicates, in order"""
+    if not value or not value.strip():
+        return []
+    value = _PARENTHETICAL.sub(' ', value)
+
+    if field == 'dosha':
+        values = _parse_dosha(value)
+    else:
+        values = _parse_rasa(value) if field == 'rasa' else None
+        if values is None:
+            tokens = _SEPARATORS.split(value)
+            if field == 'season':
+                # "Spring-summer" is two seasons, "Year-round" is one
+                tokens = [part for token in tokens
+                          for part in ([token] if token.strip().lower() in _ALIASES['season'] else token.split('-'))]
+            values = [_canonical(field, token) for token in tokens]
+
+    seen = []
+    for item in values:
+        if item and item not in seen:
+            seen.append(item)
+    return seen
+
+
+def property_filter(field, values, mode='any'):
+    """
+    SQL criterion for plants having any (or all) of `values` for `field`.
+    Values go through parse_property, so "bitter" finds Tikta.
+    """
+    wanted = []
+    for value in values:
+        for canonical in parse_property(field, value):
+            if canonical not in wanted:
+                wanted.append(canonical)
+
+    matching = (
+        select(plant_property_values.c.plant_id)
+        .join(PropertyValue, PropertyValue.id == plant_property_values.c.property_value_id)
+        .where(PropertyValue.field == field, PropertyValue.value.in_(wanted))
+    )
+    if mode == 'all' and len(wanted) > 1:
+        matching = (matching.group_by(plant_property_values.c.plant_id)
+                    .having(func.count() == len(wanted)))
+    return Plant.id.in_(matching)
+
+
+def filter_by_properties(query, filters, mode='any'):
+    """Narrow a Plant query by {field: [values]}; fields are ANDed together"""
+    for field, values in filters.items():
+        if field in PROPERTY_FIELDS and values:
+            query = query.filter(property_filter(field, values, mode))
+    return query
+
+
+def plants_with(mode='any', **filters):
+    """e.g. plants_with(rasa='Tikta', dosha=['Pitta', 'Kapha']).all()"""
+    filters = {field: [values] if isinstance(values, str) else values
+               for field, values in filters.items()}
+    return filter_by_properties(Plant.query, filters, mode)
+
+
+class PropertyTables:
+    """Keeps Plant.property_values in step with the free-text property columns."""
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['property_tables'] = self
+        if not self._listening:
+            event.listen(db.session, 'before_flush', self._before_flush)
+            self._listening = True
+
+    def _before_flush(self, session, flush_context, instances):
+        cache = {}
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Plant):
+                continue
+            state = inspect(obj)
+            if state.pending or any(state.attrs[field].history.has_changes() for field in PROPERTY_FIELDS):
+                self.sync(session, obj, cache)
+
+    def sync(self, session, plant, cache=None):
+        """Point plant.property_values at the parsed values of its columns"""
+        pairs = [(field, value) for field in PROPERTY_FIELDS
+                 for value in parse_property(field, getattr(plant, field))]
+        cache = {} if cache is None else cache
+        values = []
+        with session.no_autoflush:
+            for pair in pairs:
+                row = cache.get(pair)
+                if row is None:
+                    field, value = pair
+                    row = (session.query(PropertyValue).filter_by(field=field, value=value).first()
+                           or PropertyValue(field=field, value=value))
+                    session.add(row)
+                    cache[pair] = row
+                values.append(row)
+            if list(plant.property_values) != values:
+                plant.property_values = values
+
+    def migrate(self, only_missing=False):
+        """
+        Create the property tables and (re)derive every plant's values from
+        its text columns. Safe to run repeatedly. Returns plants processed.
+        """
+        db.create_all()
+        query = Plant.query
+        if only_missing:
+            query = query.filter(~Plant.property_values.any())
+        cache = {}
+        count = 0
+        for plant in query.all():
+            self.sync(db.session, plant, cache)
+            count += 1
+        db.session.commit()
+        return count
+
+
+property_tables = PropertyTables()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        print(f'Migrated properties for {property_tables.migrate()} plants')
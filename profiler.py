@@ -0,0 +1,266 @@
+"""
+On-demand request profiling for admins.
+
+An admin adds `?_profile=1` to any URL (or sends `X-Profile: 1`) and that
+one request runs under a sampling profiler: a helper thread records the
+request thread's Python stack every PROFILER_INTERVAL seconds. The result
+is stored under PROFILER_DIR as JSON with the route, status, total time,
+every SQL statement with its duration, and the stacks in collapsed
+format ("frame;frame;frame count"), which flamegraph.pl and speedscope
+read directly. The response carries the profile id in X-Profile-Id; the
+admin dashboard lists recent profiles.
+
+Requests without the flag pay one argument and header lookup; SQL is only
+recorded while a profiled request is running.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{6}$')
+
+
+def _frame_label(code):
+    # "package/module.py" tells this app.py from flask/app.py
+    path = code.co_filename
+    where = f'{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}'
+    return f'{code.co_name} ({where}:{code.co_firstlineno})'
+
+
+class Sampler(threading.Thread):
+    """Counts the collapsed stacks of one thread until stopped."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        labels = {}
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+class Profiler:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.interval = 0.001
+        self.keep = 50
+        self._running = 0
+        self._lock = threading.Lock()
+        self._engine_hooked = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_ENABLED', True)
+        app.config.setdefault('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('PROFILER_INTERVAL', 0.001)
+        app.config.setdefault('PROFILER_KEEP', 50)
+        self.enabled = bool(app.config['PROFILER_ENABLED'])
+        self.directory = app.config['PROFILER_DIR']
+        self.interval = float(app.config['PROFILER_INTERVAL'])
+        self.keep = int(app.config['PROFILER_KEEP'])
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if not self._engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            self._engine_hooked = True
+
+    @staticmethod
+    def requested():
+        flag = request.args.get('_profile') or request.headers.get('X-Profile')
+        return flag not in (None, '', '0')
+
+    # Request hooks
+
+    def _before_request(self):
+        if not self.requested():
+            return
+        if not (current_user.is_authenticated and current_user.is_admin()):
+            return
+        sampler = Sampler(threading.get_ident(), self.interval)
+        with self._lock:
+            self._running += 1
+        g._profile = {'queries': [], 'sampler': sampler, 'start': time.perf_counter(),
+                      'started_at': datetime.utcnow()}
+        sampler.start()
+
+    def _after_request(self, response):
+        state = g.pop('_profile', None)
+        if state is None:
+            return response
+        duration = time.perf_counter() - state['start']
+        sampler = state['sampler']
+        stacks = self._finish(sampler)
+
+        profile_id = f"{state['started_at']:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        queries = state['queries']
+        self.save({
+            'id': profile_id,
+            'started_at': state['started_at'].isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'rule': request.url_rule.rule if request.url_rule else None,
+            'status': response.status_code,
+            'user': current_user.username,
+            'duration': duration,
+            'interval': sampler.interval,
+            'samples': sampler.samples,
+            'sql_time': sum(query['duration'] for query in queries),
+            'queries': queries,
+            'stacks': stacks,
+        })
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request does not run when the response itself failed
+        state = g.pop('_profile', None)
+        if state is not None:
+            self._finish(state['sampler'])
+
+    def _finish(self, sampler):
+        stacks = sampler.stop()
+        with self._lock:
+            self._running -= 1
+        return stacks
+
+    # SQL hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._running and has_request_context() and '_profile' in g:
+            conn.info.setdefault('_profile_start', []).append((context, time.perf_counter()))
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_profile_start')
+        if not starts:
+            return
+        end = time.perf_counter()
+        _, start = starts.pop()
+        state = g.get('_profile') if has_request_context() else None
+        if state is not None:
+            state['queries'].append({
+                'statement': statement,
+                'offset': start - state['start'],
+                'duration': end - start,
+                'executemany': executemany,
+            })
+
+    def _handle_error(self, exception_context):
+        # The statement raised, so after_cursor_execute won't pop its start
+        conn = exception_context.connection
+        starts = conn.info.get('_profile_start') if conn is not None else None
+        if starts and starts[-1][0] is exception_context.execution_context:
+            starts.pop()
+
+    # Storage
+
+    def save(self, profile):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{profile['id']}.json")
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(profile, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            return
+        self._prune()
+
+    def _paths(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        ids = sorted((name[:-5] for name in names if name.endswith('.json')), reverse=True)
+        return [os.path.join(self.directory, f'{profile_id}.json') for profile_id in ids]
+
+    def _prune(self):
+        for path in self._paths()[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load(self, profile_id):
+        if not _PROFILE_ID.match(profile_id or ''):
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{profile_id}.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def recent(self, limit=None):
+        """Stored profiles, newest first, without their stacks and queries"""
+        profiles = []
+        for path in self._paths()[:limit]:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            profile['query_count'] = len(profile.pop('queries'))
+            profile.pop('stacks')
+            profiles.append(profile)
+        return profiles
+
+
+def collapsed(profile):
+    """The stacks in collapsed ("a;b;c count") format, heaviest first"""
+    stacks = sorted(profile['stacks'].items(), key=lambda item: (-item[1], item[0]))
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+
+def hot_functions(profile, limit=25):
+    """[(frame, self samples, total samples)] ordered by self samples"""
+    own, total = {}, {}
+    for stack, count in profile['stacks'].items():
+        frames = stack.split(';')
+        own[frames[-1]] = own.get(frames[-1], 0) + count
+        for frame in set(frames):
+            total[frame] = total.get(frame, 0) + count
+    ranked = sorted(own, key=lambda frame: (-own[frame], -total[frame], frame))
+    return [(frame, own[frame], total[frame]) for frame in ranked[:limit]]
+
+
+profiler = Profiler()
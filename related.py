@@ -0,0 +1,327 @@
+"""
+Precomputed "related plants".
+
+Every approved plant is encoded as a feature vector (categories,
+rasa/guna/virya/vipaka, dosha effects, family). Each group is scaled so a
+plant with many values in one group doesn't dominate, and rows are L2
+normalized, so dot products give cosine similarity. The top
+RELATED_PLANTS_COUNT neighbours of each plant are stored in the
+related_plant table, and the detail page reads them with one indexed join.
+
+The low-cardinality groups live in a dense float32 matrix with one row per
+plant. Family has one value per plant but thousands of distinct values, so
+instead of one-hot columns each row keeps a family number and weight, and
+the family term of a score is added where the numbers match. Rows are
+updated in place when plants change; freed rows are reused.
+
+A commit only updates the rows and queues the plant ids. A background
+thread recomputes the affected stored lists every
+RELATED_PLANTS_FLUSH_INTERVAL seconds, in one batch: the changed plants,
+plants whose stored list contains one of them, and plants for which a
+changed plant now scores above their current k-th neighbour.
+
+    python related.py   # recompute the whole table
+"""
+import atexit
+import os
+import threading
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from catalogue import PlantIndex
+from models import db, Plant, RelatedPlant
+from plant_properties import parse_property
+
+GROUP_WEIGHTS = {
+    'category': 1.0,
+    'rasa': 1.0,
+    'guna': 0.7,
+    'virya': 0.7,
+    'vipaka': 0.5,
+    'dosha': 1.0,
+    'family': 0.8,
+}
+
+# Rows per block when scoring the whole catalogue, bounds the block x n temporary
+BLOCK_SIZE = 1024
+NO_FAMILY = -1
+
+
+def plant_features(plant):
+    """{(group, value): weight} for one plant"""
+    groups = {group: [] for group in GROUP_WEIGHTS}
+    groups['category'] = [str(category.id) for category in plant.categories]
+    for field in ('rasa', 'guna', 'virya', 'vipaka', 'dosha'):
+        groups[field] = parse_property(field, getattr(plant, field))
+    if plant.family and plant.family.strip():
+        groups['family'] = [plant.family.strip().lower()]
+
+    features = {}
+    for group, values in groups.items():
+        if values:
+            weight = GROUP_WEIGHTS[group] / np.sqrt(len(values))
+            for value in values:
+                features[(group, value)] = weight
+    return features
+
+
+class RelatedPlants(PlantIndex):
+    # The table is shared by all workers, so every committing process must
+    # update it, even one that hasn't needed the vectors yet
+    track_unbuilt = True
+
+    def __init__(self, app=None):
+        self.app = None
+        self.count = 6
+        self.flush_interval = 1.0
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._owner_pid = None
+        self._atexit_registered = False
+        self.clear()
+        super().__init__()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RELATED_PLANTS_COUNT', 6)
+        app.config.setdefault('RELATED_PLANTS_FLUSH_INTERVAL', 1.0)
+        self.app = app
+        self.count = int(app.config['RELATED_PLANTS_COUNT'])
+        self.flush_interval = float(app.config['RELATED_PLANTS_FLUSH_INTERVAL'])
+        app.extensions['related_plants'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def clear(self):
+        self.columns = {}         # (group, value) -> dense column
+        self.families = {}        # family -> number
+        self.rows = {}            # plant_id -> row
+        self.free_rows = []
+        self.size = 0             # rows in use, including freed ones
+        self._ids = np.full(64, -1, dtype=np.int64)
+        self._dense = np.zeros((64, 32), dtype=np.float32)
+        self._family = np.full(64, NO_FAMILY, dtype=np.int32)
+        self._family_weight = np.zeros(64, dtype=np.float32)
+
+    def add(self, plant):
+        features = plant_features(plant)
+        family = None
+        for feature in features:
+            if feature[0] == 'family':
+                family = feature
+            elif feature not in self.columns:
+                self.columns[feature] = len(self.columns)
+        self._reserve(self.size + 1, len(self.columns))
+
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            row = self.size
+            self.size += 1
+        norm = np.sqrt(sum(weight * weight for weight in features.values())) or 1.0
+        self._dense[row] = 0
+        for feature, weight in features.items():
+            if feature[0] != 'family':
+                self._dense[row, self.columns[feature]] = weight / norm
+        if family is not None:
+            self._family[row] = self.families.setdefault(family[1], len(self.families))
+            self._family_weight[row] = features[family] / norm
+        self._ids[row] = plant.id
+        self.rows[plant.id] = row
+
+    def remove(self, plant_id):
+        row = self.rows.pop(plant_id, None)
+        if row is None:
+            return
+        self._ids[row] = -1
+        self._dense[row] = 0
+        self._family[row] = NO_FAMILY
+        self._family_weight[row] = 0
+        self.free_rows.append(row)
+
+    def _reserve(self, rows, columns):
+        """Grow the arrays (by doubling) to hold `rows` rows and `columns` columns"""
+        capacity, width = self._dense.shape
+        if rows <= capacity and columns <= width:
+            return
+        while capacity < rows:
+            capacity *= 2
+        while width < columns:
+            width *= 2
+        dense = np.zeros((capacity, width), dtype=np.float32)
+        dense[:self.size, :self._dense.shape[1]] = self._dense[:self.size]
+        self._dense = dense
+        if capacity > len(self._ids):
+            grow = capacity - len(self._ids)
+            self._ids = np.concatenate([self._ids, np.full(grow, -1, dtype=np.int64)])
+            self._family = np.concatenate([self._family, np.full(grow, NO_FAMILY, dtype=np.int32)])
+            self._family_weight = np.concatenate([self._family_weight, np.zeros(grow, dtype=np.float32)])
+
+    def _scores(self, block):
+        """Rounded cosine similarity of the given rows to every row; self and free rows score <= 0"""
+        dense = self._dense[:self.size, :len(self.columns)]
+        family = self._family[:self.size]
+        family_weight = self._family_weight[:self.size]
+        scores = dense[block] @ dense.T
+        same = (family[block][:, None] == family[None, :]) & (family[block][:, None] != NO_FAMILY)
+        scores += np.where(same, np.outer(family_weight[block], family_weight), 0)
+        # Rounded so BLAS summation order (which depends on the block
+        # shape) can't reorder ties
+        scores = np.round(scores, 5)
+        scores[np.arange(len(block)), block] = -1.0  # never related to itself
+        return scores
+
+    def _top_k(self, rows):
+        """[(plant_id, related_id, rank, score)] for the given row numbers"""
+        k = min(self.count, len(self.rows) - 1)
+        if k <= 0 or not len(rows):
+            return []
+        ids = self._ids[:self.size]
+        results = []
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            scores = self._scores(block)
+            kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+            for i, row in enumerate(block):
+                # Everything tied with the k-th score, ordered by score then
+                # plant id, so incremental and full recomputes agree
+                candidates = np.nonzero((scores[i] >= kth[i]) & (scores[i] > 0))[0]
+                order = np.lexsort((ids[candidates], -scores[i, candidates]))[:k]
+                for rank, column in enumerate(candidates[order], 1):
+                    results.append((int(ids[row]), int(ids[column]), rank, float(scores[i, column])))
+        return results
+
+    def _store(self, plant_ids, rows):
+        table = RelatedPlant.__table__
+        with db.engine.begin() as conn:
+            if plant_ids:
+                conn.execute(delete(table).where(table.c.plant_id.in_(list(plant_ids))))
+            if rows:
+                conn.execute(insert(table), [
+                    {'plant_id': p, 'related_plant_id': r, 'rank': n, 'score': s}
+                    for p, r, n, s in rows
+                ])
+
+    def compute_all(self):
+        """Recompute and rewrite the whole table; returns the number of plants"""
+        self.rebuild()
+        with self.reading():
+            rows = self._top_k(np.array(sorted(self.rows.values()), dtype=np.int64))
+            count = len(self.rows)
+        table = RelatedPlant.__table__
+        with db.engine.begin() as conn:
+            conn.execute(delete(table))
+        self._store((), rows)
+        return count
+
+    def apply_changes(self, plants, deleted_ids, version=None):
+        # Runs in the commit hook: update the vectors, defer the table work
+        super().apply_changes(plants, deleted_ids, version)
+        changed = {plant.id for plant in plants} | set(deleted_ids)
+        if not changed:
+            return
+        if self.app is None:
+            # Scripts without init_app (e.g. seeding): no worker to hand off to
+            self._refresh_now(changed)
+            return
+        with self._pending_lock:
+            self._pending |= changed
+        self._ensure_worker()
+
+    def flush(self):
+        """Recompute the stored lists for everything queued; returns the number of changed plants"""
+        with self._pending_lock:
+            changed, self._pending = self._pending, set()
+        if not changed:
+            return 0
+        try:
+            with self.app.app_context():
+                self._refresh_now(changed)
+        except Exception as e:
+            with self._pending_lock:
+                self._pending |= changed
+            self.app.logger.warning('Failed to update related plants: %s', e)
+            return 0
+        return len(changed)
+
+    def _refresh_now(self, changed):
+        if not self.built:
+            # Loads the committed state, changes included
+            self.rebuild()
+        self.refresh(changed)
+
+    def shutdown(self):
+        if self.app is None or self._owner_pid not in (None, os.getpid()):
+            return
+        self._wakeup.set()
+        self.flush()
+
+    def _ensure_worker(self):
+        # Started lazily and per-process so forked workers get their own thread
+        pid = os.getpid()
+        if self._thread is not None and self._owner_pid == pid and self._thread.is_alive():
+            return
+        with self._pending_lock:
+            if self._thread is not None and self._owner_pid == pid and self._thread.is_alive():
+                return
+            self._owner_pid = pid
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='related-plants', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._wakeup.wait(self.flush_interval):
+            self.flush()
+
+    def refresh(self, changed):
+        """Recompute the stored neighbours affected by changes to `changed` plant ids"""
+        table = RelatedPlant.__table__
+        with db.engine.connect() as conn:
+            listed = conn.execute(
+                select(table.c.plant_id).where(table.c.related_plant_id.in_(list(changed)))
+            ).scalars().all()
+            kth = dict(conn.execute(
+                select(table.c.plant_id, table.c.score).where(table.c.rank == self.count)
+            ).all())
+
+        with self.reading():
+            ids = self._ids[:self.size]
+            changed_rows = [self.rows[plant_id] for plant_id in changed if plant_id in self.rows]
+
+            affected = set(changed_rows)
+            affected.update(self.rows[plant_id] for plant_id in listed if plant_id in self.rows)
+            if changed_rows:
+                # Plants whose k-th neighbour now scores below one of the changed plants
+                best = self._scores(np.array(changed_rows, dtype=np.int64)).max(axis=0)
+                threshold = np.array([kth.get(int(plant_id), 0.0) for plant_id in ids])
+                live = ids >= 0
+                affected.update(np.nonzero(live & (best > 0) & (best >= threshold))[0].tolist())
+
+            rows = self._top_k(np.array(sorted(affected), dtype=np.int64))
+            stored = {int(ids[row]) for row in affected}
+        self._store(stored | set(changed), rows)
+
+    def for_plant(self, plant_id, limit=None):
+        """Related approved plants, most similar first"""
+        query = (Plant.query
+                 .join(RelatedPlant, RelatedPlant.related_plant_id == Plant.id)
+                 .filter(RelatedPlant.plant_id == plant_id, Plant.is_approved.is_(True))
+                 .order_by(RelatedPlant.rank))
+        return query.limit(limit or self.count).all()
+
+
+related_plants = RelatedPlants()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(f'Computed related plants for {related_plants.compute_all()} plants')
@@ -0,0 +1,306 @@
+"""
+Offline semantic search over plant descriptions (latent semantic analysis).
+
+Plant text is turned into TF-IDF vectors and reduced to
+SEMANTIC_DIMENSIONS latent dimensions with a truncated SVD computed in
+NumPy, so "herbs to calm the mind" can match plants described with
+"stress", "anxiety" and "sleep" that co-occur with those words elsewhere.
+A query is projected the same way and scored against every plant with one
+matrix-vector product.
+
+Plants approved after the last fit are folded into the existing latent
+space; the model is refitted once folded-in plants exceed REFIT_FRACTION
+of the catalogue. The plant vectors are saved under SEMANTIC_INDEX_DIR as
+a float32 .npy file that workers memory-map at startup when it matches the
+current catalogue, next to model.npz (vocabulary, idf, projection).
+Writes are debounced: a burst of commits is saved once,
+SEMANTIC_SAVE_DELAY seconds after the first of them, and a save still
+waiting at exit is written then.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from catalogue import PlantIndex, catalogue_version, load_plants
+from metrics import metrics
+from symptom_index import tokenize
+
+TEXT_FIELDS = (
+    'description', 'benefits', 'uses', 'medicinal_properties', 'pharmacological_actions',
+    'therapeutic_uses', 'culinary_uses', 'growing_conditions',
+)
+
+MAX_TERMS = 5000
+REFIT_FRACTION = 0.2
+FORMAT_VERSION = 1
+KEEP_OLD_FILES = 2
+
+
+def plant_terms(plant):
+    counts = {}
+    for field in TEXT_FIELDS:
+        for token in tokenize(getattr(plant, field)):
+            counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def truncated_svd(matrix, k, oversample=10, iterations=4, seed=0):
+    """Randomized truncated SVD (Halko et al.); returns U, S, Vt with k components"""
+    rng = np.random.default_rng(seed)
+    probe = rng.standard_normal((matrix.shape[1], min(k + oversample, min(matrix.shape))))
+    basis, _ = np.linalg.qr(matrix @ probe)
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(matrix.T @ basis)
+        basis, _ = np.linalg.qr(matrix @ basis)
+    u, s, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return (basis @ u)[:, :k], s[:k], vt[:k]
+
+
+class SemanticIndex(PlantIndex):
+    def __init__(self, app=None):
+        self.directory = None
+        self.dimensions = 64
+        self.save_delay = 5.0
+        self._save_timer = None
+        self._atexit_registered = False
+        self.clear()
+        super().__init__()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEMANTIC_INDEX_DIR', os.path.join(app.instance_path, 'semantic'))
+        app.config.setdefault('SEMANTIC_DIMENSIONS', 64)
+        app.config.setdefault('SEMANTIC_SAVE_DELAY', 5.0)
+        self.directory = app.config['SEMANTIC_INDEX_DIR']
+        self.dimensions = int(app.config['SEMANTIC_DIMENSIONS'])
+        self.save_delay = float(app.config['SEMANTIC_SAVE_DELAY'])
+        app.extensions['semantic_index'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def clear(self):
+        self.docs = {}             # plant_id -> term counts (empty after loading from disk)
+        self.complete = True       # whether docs covers every indexed plant
+        self.pending = set()       # plant ids waiting to be folded in
+        self.vocabulary = {}       # term -> column
+        self.idf = None
+        self.projection = None     # (terms x dimensions) float32
+        self.ids = []              # row -> plant_id
+        self.rows = {}             # plant_id -> row
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.folded = 0
+
+    def add(self, plant):
+        self.docs[plant.id] = plant_terms(plant)
+        self.pending.add(plant.id)
+
+    def remove(self, plant_id):
+        self.docs.pop(plant_id, None)
+        self.pending.discard(plant_id)
+        row = self.rows.pop(plant_id, None)
+        if row is None:
+            return
+        if not self.vectors.flags.writeable:
+            self.vectors = np.array(self.vectors)  # a read-only memmap, copied once
+        # Swap-delete; the slice is a view, so nothing else is copied
+        last = len(self.ids) - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.vectors = self.vectors[:last]
+        self.ids.pop()
+
+    # Model
+
+    def _weights(self, counts):
+        """L2-normalized TF-IDF vector (dense, over the vocabulary) for term counts"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term, count in counts.items():
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] = (1 + np.log(count)) * self.idf[column]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _project(self, weights):
+        vectors = np.atleast_2d(weights) @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def fit(self):
+        """Refit the vocabulary and latent space on every indexed plant"""
+        if not self.complete:
+            # Loaded from disk: re-read the text of the plants in the index
+            indexed = set(self.ids) | self.pending
+            self.docs = {plant.id: plant_terms(plant) for plant in load_plants(indexed)}
+            self.complete = True
+
+        ids = sorted(self.docs)
+        df = {}
+        for counts in self.docs.values():
+            for term in counts:
+                df[term] = df.get(term, 0) + 1
+        min_df = 2 if len(ids) > 200 else 1
+        terms = sorted((t for t, n in df.items() if n >= min_df), key=lambda t: (-df[t], t))[:MAX_TERMS]
+        self.vocabulary = {term: i for i, term in enumerate(sorted(terms))}
+        self.idf = np.array([np.log((1 + len(ids)) / (1 + df[term])) + 1 for term in sorted(terms)],
+                            dtype=np.float32)
+
+        matrix = np.array([self._weights(self.docs[plant_id]) for plant_id in ids], dtype=np.float32)
+        k = min(self.dimensions, len(ids) - 1, len(self.vocabulary))
+        if k < 1:
+            self.projection = np.zeros((len(self.vocabulary), 0), dtype=np.float32)
+            self.ids, self.vectors = ids, np.zeros((len(ids), 0), dtype=np.float32)
+        else:
+            _, _, vt = truncated_svd(matrix, k)
+            self.projection = vt.T.astype(np.float32)
+            self.ids, self.vectors = ids, self._project(matrix)
+        self.rows = {plant_id: row for row, plant_id in enumerate(ids)}
+        self.pending = set()
+        self.folded = 0
+
+    def fold_in(self):
+        """Project pending plants into the current latent space without refitting"""
+        ids = sorted(self.pending)
+        self.pending = set()
+        if not ids:
+            return
+        vectors = self._project(np.array([self._weights(self.docs[plant_id]) for plant_id in ids]))
+        self.vectors = np.vstack([np.asarray(self.vectors).reshape(-1, vectors.shape[1]), vectors])
+        self.rows.update((plant_id, row) for row, plant_id in enumerate(ids, len(self.ids)))
+        self.ids = self.ids + ids
+        self.folded += len(ids)
+
+    def after_update(self):
+        total = len(self.ids) + len(self.pending)
+        if self.projection is None or self.folded + len(self.pending) > REFIT_FRACTION * total:
+            self.fit()
+        else:
+            self.fold_in()
+        if self.directory is not None:
+            self._schedule_save()
+
+    def search(self, query, limit=20):
+        """[(plant_id, similarity)] best first"""
+        counts = {}
+        for token in tokenize(query):
+            counts[token] = counts.get(token, 0) + 1
+        if not counts:
+            return []
+        self.ensure_fresh()
+        with self.reading():
+            if not self.ids or self.vectors.shape[1] == 0:
+                return []
+            weights = self._weights(counts)
+            if not weights.any():
+                return []
+            scores = self.vectors @ self._project(weights)[0]
+            limit = min(limit, len(self.ids))
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [(self.ids[row], float(scores[row])) for row in top if scores[row] > 0]
+
+    # Persistence
+
+    def rebuild(self, plants=None):
+        if plants is None:
+            loaded = self._load()
+            metrics.cache_result('semantic_index_file', loaded)
+            if loaded:
+                return
+        super().rebuild(plants)
+
+    def _version_key(self):
+        return [FORMAT_VERSION, *(self._version or catalogue_version())]
+
+    def shutdown(self):
+        timer = self._save_timer
+        if timer is not None and timer.is_alive():
+            timer.cancel()
+            self._save_now()
+
+    def _schedule_save(self):
+        # One write per burst of commits instead of one per commit
+        timer = self._save_timer
+        if timer is not None and timer.is_alive():
+            return
+        self._save_timer = threading.Timer(self.save_delay, self._save_now)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _save_now(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        generation = uuid.uuid4().hex[:12]
+        vectors_name = f'vectors.{generation}.npy'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            vectors_path = os.path.join(self.directory, vectors_name)
+            np.save(vectors_path, np.ascontiguousarray(self.vectors, dtype=np.float32))
+
+            meta = {
+                'version': self._version_key(),
+                'vectors': vectors_name,
+                'ids': self.ids,
+                'folded': self.folded,
+                'terms': sorted(self.vocabulary, key=self.vocabulary.get),
+            }
+            tmp = os.path.join(self.directory, f'model.{generation}.tmp.npz')
+            np.savez(tmp, meta=np.array(json.dumps(meta)), idf=self.idf, projection=self.projection)
+            os.replace(tmp, os.path.join(self.directory, 'model.npz'))
+        except OSError:
+            # Only a startup cache; the in-memory index is current
+            return
+        self._prune(vectors_name)
+
+    def _prune(self, current):
+        paths = glob.glob(os.path.join(self.directory, 'vectors.*.npy'))
+        old = sorted((p for p in paths if os.path.basename(p) != current), key=os.path.getmtime, reverse=True)
+        for path in old[KEEP_OLD_FILES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load(self):
+        if self.directory is None:
+            return False
+        try:
+            with np.load(os.path.join(self.directory, 'model.npz')) as model:
+                meta = json.loads(str(model['meta']))
+                idf, projection = model['idf'], model['projection']
+            version = catalogue_version()
+            if meta['version'] != [FORMAT_VERSION, *version]:
+                return False
+            vectors = np.load(os.path.join(self.directory, meta['vectors']), mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return False
+        if vectors.shape[0] != len(meta['ids']):
+            return False
+
+        with self._lock:
+            self.clear()
+            self.complete = False
+            self.vocabulary = {term: i for i, term in enumerate(meta['terms'])}
+            self.idf, self.projection = idf, projection
+            self.ids, self.vectors = list(meta['ids']), vectors
+            self.rows = {plant_id: row for row, plant_id in enumerate(self.ids)}
+            self.folded = meta['folded']
+            self._built = True
+            self._version = version
+            self._checked_at = time.monotonic()
+        return True
+
+
+semantic_index = SemanticIndex()
@@ -0,0 +1,233 @@
+"""
+Production entry point: serves the app with Waitress.
+
+    python serve.py                       # one process, WAITRESS_THREADS threads
+    python serve.py --processes 0         # one Waitress process per CPU core
+
+With more than one process the parent binds the listening socket once and
+forks workers that all accept from it, so the kernel spreads connections
+across cores. The parent only supervises: it restarts workers that die and
+forwards SIGINT/SIGTERM for a clean shutdown. On either signal a server
+process stops accepting, gives in-flight requests --graceful-timeout seconds to
+finish and exits normally, so atexit hooks flush what the app buffers in
+memory. Workers share a METRICS_MULTIPROC_DIR (a temporary directory
+unless set) so /metrics reports all of them. Every option can also be set
+through the environment variable shown in --help.
+"""
+import argparse
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+from waitress import create_server
+
+
+def _env(name, default, cast=int):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, '') else default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'), help='bind address (HOST)')
+    parser.add_argument('--port', type=int, default=_env('PORT', 5000), help='bind port (PORT)')
+    parser.add_argument('--threads', type=int, default=_env('WAITRESS_THREADS', 8),
+                        help='worker threads per process (WAITRESS_THREADS)')
+    parser.add_argument('--connection-limit', type=int, default=_env('WAITRESS_CONNECTION_LIMIT', 100),
+                        help='open connections per process (WAITRESS_CONNECTION_LIMIT)')
+    parser.add_argument('--backlog', type=int, default=_env('WAITRESS_BACKLOG', 1024),
+                        help='listen() backlog (WAITRESS_BACKLOG)')
+    parser.add_argument('--channel-timeout', type=int, default=_env('WAITRESS_CHANNEL_TIMEOUT', 120),
+                        help='seconds before an idle connection is closed (WAITRESS_CHANNEL_TIMEOUT)')
+    parser.add_argument('--processes', type=int, default=_env('WEB_CONCURRENCY', 1),
+                        help='worker processes; 0 means one per CPU core (WEB_CONCURRENCY)')
+    parser.add_argument('--graceful-timeout', type=int, default=_env('WAITRESS_GRACEFUL_TIMEOUT', 10),
+                        help='seconds in-flight requests get to finish on shutdown (WAITRESS_GRACEFUL_TIMEOUT)')
+    return parser.parse_args(argv)
+
+
+def waitress_options(args):
+    return {
+        'threads': args.threads,
+        'connection_limit': args.connection_limit,
+        'backlog': args.backlog,
+        'channel_timeout': args.channel_timeout,
+    }
+
+
+def prepare():
+    """Create tables and upload folders once, before any worker starts"""
+    from app import create_app, init_database
+    from models import db
+
+    app = create_app()
+    init_database(app)
+    with app.app_context():
+        # Don't hand pooled SQLite connections down to forked workers
+        db.engine.dispose()
+
+
+def serve_single(args):
+    from app import create_app
+
+    # Not waitress.serve(): it leaves SIGTERM at the default, which skips atexit
+    server = create_server(create_app(), host=args.host, port=args.port, **waitress_options(args))
+    logging.basicConfig()
+    server.print_listen('Serving on http://{}:{}')
+    run_until_stopped(server, args.graceful_timeout)
+
+
+def run_until_stopped(server, grace):
+    """
+    server.run(), but SIGINT/SIGTERM stop it cleanly: the listening socket
+    closes, connections close once their responses are flushed, and after
+    at most `grace` seconds the task threads are shut down and this returns.
+    """
+    stop_at = []
+
+    def stop(signum, frame):
+        if not stop_at:
+            stop_at.append(time.monotonic())
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    adj = server.adj
+    while server.accepting or server.active_channels:
+        server.asyncore.loop(timeout=adj.asyncore_loop_timeout, map=server._map,
+                             use_poll=adj.asyncore_use_poll, count=1)
+        if not stop_at:
+            continue
+        if server.accepting:
+            # Not server.close(): that also closes the trigger running tasks wake the loop with
+            server.accepting = False
+            server.del_channel()
+            server.socket.close()
+        if time.monotonic() - stop_at[0] >= grace:
+            break
+        for channel in list(server.active_channels.values()):
+            if not channel.requests:
+                channel.close_when_flushed = True
+
+    server.task_dispatcher.shutdown()
+    server.close()
+    for channel in list(server.active_channels.values()):
+        channel.close()
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def _worker(sock, args):
+    # The app (and its DB engine, thread and process pools) is built after
+    # fork so no worker shares connections or locks with another.
+    from app import create_app
+
+    # Until run_until_stopped() installs its own, not the parent's handlers
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        server = create_server(create_app(), sockets=[sock], **waitress_options(args))
+        run_until_stopped(server, args.graceful_timeout)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+    # Never return into the parent's loop; sys.exit (not os._exit) runs atexit hooks
+    sys.exit(0)
+
+
+def metrics_dir():
+    """
+    The METRICS_MULTIPROC_DIR workers write their metric snapshots to,
+    emptied so counts restart with the server, and whether we created it
+    """
+    path = os.getenv('METRICS_MULTIPROC_DIR')
+    if not path:
+        return tempfile.mkdtemp(prefix='herbal-metrics-'), True
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(('.json', '.tmp')) or name == 'last_scrape':
+            os.remove(os.path.join(path, name))
+    return path, False
+
+
+def serve_multi(args, processes):
+    sock = bind_socket(args.host, args.port, args.backlog)
+    multiproc_dir, temporary = metrics_dir()
+    os.environ['METRICS_MULTIPROC_DIR'] = multiproc_dir
+    print(f'Serving on http://{args.host}:{args.port} with {processes} processes '
+          f'x {args.threads} threads', flush=True)
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _worker(sock, args)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(processes):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f'Worker {pid} exited with status {status}, restarting', file=sys.stderr, flush=True)
+        if time.monotonic() - started < 1:
+            # Crashing on startup; don't spin
+            time.sleep(1)
+        spawn()
+
+    sock.close()
+    if temporary:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    processes = args.processes if args.processes > 0 else (os.cpu_count() or 1)
+    # Workers size their password hashing pools from this (see password_hasher.py)
+    os.environ['WEB_CONCURRENCY'] = str(processes)
+
+    prepare()
+    if processes == 1 or not hasattr(os, 'fork'):
+        serve_single(args)
+    else:
+        serve_multi(args, processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Slow-query log.
+
+Every SQL statement is timed with the engine's cursor events; one that
+takes longer than SLOW_QUERY_THRESHOLD seconds is logged with its bound
+parameters, the request that issued it and, on SQLite, its EXPLAIN QUERY
+PLAN, so "SCAN plant" shows which filter is missing an index:
+
+    slow query 0.142s in GET /?q=tulsi (index)
+    SELECT plant.id, ... FROM plant WHERE lower(plant.name) LIKE lower(?) ...
+    params: ('%tulsi%', ...)
+    plan:
+      SCAN plant
+
+Records go through a QueueHandler, and a QueueListener thread writes them
+to SLOW_QUERY_LOG (stderr when unset), so a request never waits on disk.
+Plans are cached per statement text.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MAX_PARAM_LENGTH = 200
+MAX_PARAMS_LENGTH = 2000
+MAX_CACHED_PLANS = 256
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+
+logger = logging.getLogger('herbal_garden.slow_queries')
+
+
+def _short(value):
+    text = repr(value)
+    return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + '...'
+
+
+def format_params(parameters):
+    if isinstance(parameters, dict):
+        text = '{' + ', '.join(f'{key!r}: {_short(value)}' for key, value in parameters.items()) + '}'
+    elif isinstance(parameters, (list, tuple)):
+        text = '(' + ', '.join(_short(value) for value in parameters) + ')'
+    else:
+        text = _short(parameters)
+    return text if len(text) <= MAX_PARAMS_LENGTH else f'{text[:MAX_PARAMS_LENGTH]}... ({len(parameters)} values)'
+
+
+def format_plan(rows):
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as an indented tree"""
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLog:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 0.1
+        self.explain = True
+        self.path = None
+        self._plans = {}
+        self._listener = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+        self._engine_hooked = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_ENABLED', True)
+        app.config.setdefault('SLOW_QUERY_THRESHOLD', 0.1)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        app.config.setdefault('SLOW_QUERY_LOG', None)
+        self.enabled = bool(app.config['SLOW_QUERY_ENABLED'])
+        self.threshold = float(app.config['SLOW_QUERY_THRESHOLD'])
+        self.explain = bool(app.config['SLOW_QUERY_EXPLAIN'])
+        self.path = app.config['SLOW_QUERY_LOG']
+        app.extensions['slow_query_log'] = self
+        if self.enabled and not self._engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            atexit.register(self.shutdown)
+            self._engine_hooked = True
+
+    # Engine hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault('_slow_query_start', []).append((context, time.perf_counter()))
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_slow_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()[1]
+        if elapsed < self.threshold:
+            return
+
+        plan = None
+        if self.explain and not executemany and conn.dialect.name == 'sqlite':
+            plan = self._plan(cursor, statement, parameters)
+        route = None
+        if has_request_context():
+            route = f'{request.method} {request.full_path.rstrip("?")} ({request.endpoint or "unmatched"})'
+        self._emit(elapsed, statement, parameters, executemany, route, plan)
+
+    def _handle_error(self, exception_context):
+        # Errors skip after_cursor_execute; pop the failed statement's start here
+        conn = exception_context.connection
+        starts = conn.info.get('_slow_query_start') if conn is not None else None
+        if starts and starts[-1][0] is exception_context.execution_context:
+            starts.pop()
+
+    def _plan(self, cursor, statement, parameters):
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return None
+        plan = self._plans.get(statement)
+        if plan is None:
+            try:
+                rows = cursor.connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            except Exception as e:
+                return f'(EXPLAIN failed: {e})'
+            plan = format_plan(rows)
+            if len(self._plans) >= MAX_CACHED_PLANS:
+                self._plans.clear()
+            self._plans[statement] = plan
+        return plan
+
+    # Logging
+
+    def _emit(self, elapsed, statement, parameters, executemany, route, plan):
+        self._ensure_listener()
+        params = f'{len(parameters)} parameter sets' if executemany else format_params(parameters)
+        message = [f'slow query {elapsed:.3f}s in {route or "background task"}', statement.strip(),
+                   f'params: {params}']
+        if plan is not None:
+            message.append('plan:\n' + plan)
+        logger.warning('\n'.join(message))
+
+    def _ensure_listener(self):
+        # Started lazily and per process, so forked workers get their own thread
+        pid = os.getpid()
+        if self._owner_pid == pid:
+            return
+        with self._lock:
+            if self._owner_pid == pid:
+                return
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                handler = logging.FileHandler(self.path, encoding='utf-8', delay=True)
+            else:
+                handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(f'%(asctime)s [{pid}] %(message)s'))
+
+            records = queue.SimpleQueue()
+            logger.handlers = [logging.handlers.QueueHandler(records)]
+            logger.setLevel(logging.WARNING)
+            logger.propagate = False
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            self._owner_pid = pid
+
+    def shutdown(self):
+        """Write out anything still queued"""
+        if self._listener is not None and self._owner_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._owner_pid = None
+
+
+slow_query_log = SlowQueryLog()
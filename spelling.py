@@ -0,0 +1,141 @@
+"""
+"Did you mean" corrections for plant searches (SymSpell-style).
+
+Every plant name, and every word of it, is stored as a term in both its
+original script and its Latin transliteration. For each term we precompute
+all strings reachable by deleting up to MAX_DISTANCE characters from its
+first PREFIX_LENGTH characters. A query generates its own deletes, and any
+term sharing one of them is a candidate; only those few candidates get a
+real edit-distance check. Lookup cost depends on the query length, not on
+the size of the catalogue.
+"""
+from itertools import combinations
+
+from catalogue import PlantIndex, plant_names
+from transliterate import normalize, to_latin
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_TERM_LENGTH = 3
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(term, max_distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+    prefix = term[:prefix_length]
+    result = {prefix}
+    for distance in range(1, min(max_distance, len(prefix)) + 1):
+        for positions in combinations(range(len(prefix)), distance):
+            result.add(''.join(ch for i, ch in enumerate(prefix) if i not in positions))
+    return result
+
+
+class SpellingIndex(PlantIndex):
+    def __init__(self):
+        self.terms = {}
+        self.deletes = {}
+        self.plant_terms = {}
+        super().__init__()
+
+    def clear(self):
+        # term -> {plant_id: display text}
+        self.terms = {}
+        # delete -> set of terms
+        self.deletes = {}
+        self.plant_terms = {}
+
+    def terms_for(self, plant):
+        for field, value in plant_names(plant):
+            candidates = [value] + (value.split() if ' ' in value else [])
+            for text in candidates:
+                for term in (normalize(text), to_latin(text)):
+                    if len(term) >= MIN_TERM_LENGTH:
+                        yield term, text
+
+    def add(self, plant):
+        terms = set()
+        for term, display in self.terms_for(plant):
+            owners = self.terms.get(term)
+            if owners is None:
+                owners = self.terms[term] = {}
+                for delete in deletes(term):
+                    self.deletes.setdefault(delete, set()).add(term)
+            owners.setdefault(plant.id, display)
+            terms.add(term)
+        self.plant_terms[plant.id] = terms
+
+    def remove(self, plant_id):
+        for term in self.plant_terms.pop(plant_id, ()):
+            owners = self.terms.get(term)
+            if owners is None:
+                continue
+            owners.pop(plant_id, None)
+            if owners:
+                continue
+            del self.terms[term]
+            for delete in deletes(term):
+                bucket = self.deletes.get(delete)
+                if bucket is not None:
+                    bucket.discard(term)
+                    if not bucket:
+                        del self.deletes[delete]
+
+    def correct(self, query, limit=5, max_distance=MAX_DISTANCE):
+        """
+        Closest indexed names to query, best first:
+        [{'term', 'text', 'distance', 'plant_ids'}]. Exact hits are skipped.
+        """
+        query = normalize(query or '')
+        if len(query) < MIN_TERM_LENGTH:
+            return []
+        forms = {query, to_latin(query)}
+
+        self.ensure_fresh()
+        best = {}
+        with self.reading():
+            for form in forms:
+                candidates = set()
+                for delete in deletes(form, max_distance):
+                    candidates |= self.deletes.get(delete, set())
+                for term in candidates:
+                    if term in best or term == form:
+                        continue
+                    distance = edit_distance(form, term, max_distance)
+                    if distance <= max_distance:
+                        best[term] = distance
+            if any(form in self.terms for form in forms):
+                return []
+            ranked = sorted(best.items(), key=lambda item: (item[1], -len(self.terms[item[0]]), item[0]))
+            results = []
+            for term, distance in ranked[:limit]:
+                owners = self.terms[term]
+                results.append({
+                    'term': term,
+                    'text': next(iter(owners.values())),
+                    'distance': distance,
+                    'plant_ids': sorted(owners),
+                })
+        return results
+
+
+spelling_index = SpellingIndex()
@@ -0,0 +1,218 @@
+// Search suggestions for the catalogue search box: answered from the
+// prebuilt client-side index when the page links one, else /api/suggest
+class SearchSuggestions {
+    constructor(form, input) {
+        this.form = form;
+        this.initSearchSuggestions(input);
+
+        // Debounce keystrokes
+        let timeout;
+        input.addEventListener('input', (e) => {
+            clearTimeout(timeout);
+            timeout = setTimeout(() => {
+                this.performSearch(e.target.value);
+            }, 300);
+        });
+    }
+
+    async performSearch(query) {
+        query = query.trim();
+        if (!query) {
+            this.renderSuggestions([]);
+            return;
+        }
+
+        // Answer locally from the prebuilt index when it is available
+        const index = await this.loadSearchIndex();
+        if (index) {
+            this.renderSuggestions(this.searchLocally(index, query, 8));
+            return;
+        }
+
+        // Drop responses that arrive after a newer keystroke
+        const requestId = ++this.suggestRequestId;
+        try {
+            const response = await fetch(`/api/suggest?q=${encodeURIComponent(query)}&limit=8`);
+            if (!response.ok || requestId !== this.suggestRequestId) return;
+            this.renderSuggestions(await response.json());
+        } catch (error) {
+            console.warn('Suggestions unavailable:', error);
+        }
+    }
+
+    loadSearchIndex() {
+        if (this.searchIndexPromise) return this.searchIndexPromise;
+
+        const meta = document.querySelector('meta[name="search-index"]');
+        if (!meta) return Promise.resolve(null);
+
+        // The URL is content-hashed, so the browser cache keeps it across visits
+        this.searchIndexPromise = fetch(meta.content)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => data && data.format === 1 ? this.prepareSearchIndex(data) : null)
+            .catch(() => null);
+        return this.searchIndexPromise;
+    }
+
+    prepareSearchIndex(data) {
+        const field = name => data.fields.indexOf(name);
+        const nameFields = ['name', 'common_names', 'scientific_name', 'ayurvedic_name', 'hindi_name', 'sanskrit_name'];
+
+        return data.plants.map(row => {
+            const names = [];
+            nameFields.forEach((name, rank) => {
+                const value = row[field(name)];
+                (Array.isArray(value) ? value : [value]).forEach(text => {
+                    if (text) names.push({ text, rank, normalized: this.normalizeSearchText(text) });
+                });
+            });
+            return {
+                id: row[field('id')],
+                name: row[field('name')],
+                scientific_name: row[field('scientific_name')],
+                categories: row[field('categories')].map(i => data.categories[i]),
+                image: row[field('image')],
+                names,
+                keys: row[field('keys')].split(' ')
+            };
+        });
+    }
+
+    normalizeSearchText(text) {
+        return text.normalize('NFC').toLowerCase().normalize('NFD')
+            .replace(/([a-z])[\u0300-\u036f]+/g, '$1').normalize('NFC')
+            .replace(/\s+/g, ' ').trim();
+    }
+
+    // Same phonetic skeleton as transliterate.skeleton() for Latin input
+    searchSkeleton(text) {
+        const rules = [['chh', 'c'], ['ch', 'c'], ['sh', 's'], ['ph', 'f'], ['kh', 'k'], ['gh', 'g'],
+            ['jh', 'j'], ['th', 't'], ['dh', 'd'], ['bh', 'b'], ['w', 'v'], ['z', 'j'],
+            ['q', 'k'], ['ee', 'i'], ['oo', 'u']];
+        return this.normalizeSearchText(text).replace(/[^0-9a-z ]+/g, ' ').split(' ')
+            .filter(Boolean)
+            .map(word => {
+                rules.forEach(([from, to]) => { word = word.split(from).join(to); });
+                word = word.replace(/(.)\1+/g, '$1');
+                return word.charAt(0) + word.slice(1).replace(/a/g, '');
+            })
+            .join(' ');
+    }
+
+    searchLocally(index, query, limit) {
+        const normalized = this.normalizeSearchText(query);
+        const skeleton = this.searchSkeleton(query);
+        const matches = [];
+
+        index.forEach(plant => {
+            let best = null;
+            plant.names.forEach(name => {
+                const words = name.normalized.split(' ');
+                let score = null;
+                if (name.normalized.startsWith(normalized)) {
+                    score = name.rank;
+                } else if (words.some(word => word.startsWith(normalized))) {
+                    score = 10 + name.rank;
+                } else if (name.normalized.includes(normalized)) {
+                    score = 20 + name.rank;
+                }
+                if (score !== null && (!best || score < best.score)) {
+                    best = { score, text: name.text };
+                }
+            });
+            if (!best && skeleton && plant.keys.some(key => key.startsWith(skeleton))) {
+                best = { score: 30, text: plant.name };
+            }
+            if (best) matches.push({ plant, ...best });
+        });
+
+        matches.sort((a, b) => a.score - b.score || a.text.length - b.text.length);
+        return matches.slice(0, limit).map(({ plant, text }) => ({
+            id: plant.id,
+            name: plant.name,
+            scientific_name: plant.scientific_name,
+            match: text
+        }));
+    }
+
+    initSearchSuggestions(input) {
+        this.suggestRequestId = 0;
+        this.activeSuggestion = -1;
+
+        const list = document.createElement('ul');
+        list.className = 'search-suggestions';
+        list.setAttribute('role', 'listbox');
+        list.hidden = true;
+        input.setAttribute('autocomplete', 'off');
+        input.addEventListener('focus', () => this.loadSearchIndex(), { once: true });
+        this.form.insertAdjacentElement('afterend', list);
+        this.suggestionList = list;
+
+        input.addEventListener('keydown', (e) => {
+            const items = list.querySelectorAll('.suggestion-item');
+            if (list.hidden || !items.length) return;
+
+            if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+                e.preventDefault();
+                const step = e.key === 'ArrowDown' ? 1 : -1;
+                this.activeSuggestion = (this.activeSuggestion + step + items.length) % items.length;
+                items.forEach((item, index) => {
+                    item.classList.toggle('active', index === this.activeSuggestion);
+                });
+            } else if (e.key === 'Enter' && this.activeSuggestion >= 0) {
+                e.preventDefault();
+                items[this.activeSuggestion].querySelector('a').click();
+            } else if (e.key === 'Escape') {
+                this.renderSuggestions([]);
+            }
+        });
+
+        document.addEventListener('click', (e) => {
+            if (!e.target.closest('.search-suggestions') && e.target !== input) {
+                this.renderSuggestions([]);
+            }
+        });
+    }
+
+    renderSuggestions(suggestions) {
+        const list = this.suggestionList;
+        if (!list) return;
+
+        list.innerHTML = '';
+        this.activeSuggestion = -1;
+
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('li');
+            item.className = 'suggestion-item';
+            item.setAttribute('role', 'option');
+
+            const link = document.createElement('a');
+            link.href = `/plant/${suggestion.id}`;
+
+            const name = document.createElement('span');
+            name.className = 'suggestion-name';
+            name.textContent = suggestion.name;
+            link.appendChild(name);
+
+            const detail = document.createElement('span');
+            detail.className = 'suggestion-detail';
+            detail.textContent = suggestion.match !== suggestion.name
+                ? suggestion.match
+                : (suggestion.scientific_name || '');
+            link.appendChild(detail);
+
+            item.appendChild(link);
+            list.appendChild(item);
+        });
+
+        list.hidden = suggestions.length === 0;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const searchForm = document.querySelector('.search-form');
+    const searchInput = searchForm?.querySelector('input[name="q"]');
+    if (searchInput) {
+        window.searchSuggestions = new SearchSuggestions(searchForm, searchInput);
+    }
+});
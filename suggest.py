@@ -0,0 +1,209 @@
+"""
+Typeahead suggestions for the search box.
+
+Every name a plant is known by (English, scientific, Hindi, Sanskrit,
+Ayurvedic and common names) is stored in a compressed (radix) trie, along
+with each later word of multi-word names so "basil" finds "Holy Basil".
+A prefix query walks to the prefix node and collects completions breadth
+first, so shorter matches come first and the walk stops as soon as
+`limit` plants have been found.
+"""
+import unicodedata
+from collections import deque
+
+from catalogue import PlantIndex, plant_names
+
+# Lower rank = shown first when two completions are equally short
+FIELD_RANK = {
+    'name': 0,
+    'common_names': 1,
+    'scientific_name': 2,
+    'ayurvedic_name': 3,
+    'hindi_name': 4,
+    'sanskrit_name': 5,
+}
+
+
+def normalize(text):
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+
+class _Node:
+    __slots__ = ('edges', 'entries')
+
+    def __init__(self):
+        # first character -> (edge label, child node)
+        self.edges = {}
+        # plant_id -> (rank, matched text, field)
+        self.entries = {}
+
+
+def _common_prefix(a, b):
+    i = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        i += 1
+    return i
+
+
+class RadixTrie:
+    """Compressed prefix tree mapping keys to {plant_id: payload}."""
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def insert(self, key, plant_id, payload):
+        node = self.root
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None:
+                child = _Node()
+                node.edges[key[0]] = (key, child)
+                node = child
+                break
+            label, child = edge
+            shared = _common_prefix(label, key)
+            if shared < len(label):
+                # Split the edge at the point where key diverges
+                middle = _Node()
+                middle.edges[label[shared]] = (label[shared:], child)
+                node.edges[key[0]] = (label[:shared], middle)
+                child = middle
+            node, key = child, key[shared:]
+
+        current = node.entries.get(plant_id)
+        if current is None:
+            self.size += 1
+        if current is None or payload < current:
+            node.entries[plant_id] = payload
+
+    def remove(self, key, plant_id):
+        path = []
+        node = self.root
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None or not key.startswith(edge[0]):
+                return
+            path.append((node, key[0]))
+            node, key = edge[1], key[len(edge[0]):]
+
+        if node.entries.pop(plant_id, None) is None:
+            return
+        self.size -= 1
+
+        # Prune empty leaves and re-merge single-child chains
+        while path:
+            parent, first = path.pop()
+            label, child = parent.edges[first]
+            if not child.entries and not child.edges:
+                del parent.edges[first]
+            elif not child.entries and len(child.edges) == 1:
+                (sub_label, grandchild), = child.edges.values()
+                parent.edges[first] = (label + sub_label, grandchild)
+            else:
+                break
+
+    def find(self, prefix):
+        """Return the node whose subtree holds every key starting with prefix"""
+        node = self.root
+        while prefix:
+            edge = node.edges.get(prefix[0])
+            if edge is None:
+                return None
+            label, child = edge
+            if prefix.startswith(label):
+                node, prefix = child, prefix[len(label):]
+            elif label.startswith(prefix):
+                return child
+            else:
+                return None
+        return node
+
+    def complete(self, prefix, limit):
+        """Up to `limit` (plant_id, payload) pairs, shortest completions first"""
+        start = self.find(prefix)
+        if start is None:
+            return []
+
+        found = {}
+        level = deque([start])
+        while level and len(found) < limit:
+            next_level = deque()
+            batch = []
+            for node in level:
+                for plant_id, payload in node.entries.items():
+                    if plant_id not in found:
+                        batch.append((payload, plant_id))
+                next_level.extend(child for _, child in node.edges.values())
+            for payload, plant_id in sorted(batch):
+                if plant_id not in found:
+                    found[plant_id] = payload
+                    if len(found) >= limit:
+                        break
+            level = next_level
+        return list(found.items())
+
+
+class SuggestionIndex(PlantIndex):
+    def __init__(self):
+        self.trie = RadixTrie()
+        self.plants = {}
+        super().__init__()
+
+    def clear(self):
+        self.trie = RadixTrie()
+        self.plants = {}
+
+    def keys_for(self, plant):
+        """Yield (key, payload) pairs under which a plant is indexed"""
+        for field, value in plant_names(plant):
+            rank = FIELD_RANK.get(field, len(FIELD_RANK))
+            key = normalize(value)
+            yield key, (rank, value, field)
+            words = key.split(' ')
+            for i in range(1, len(words)):
+                yield ' '.join(words[i:]), (rank + len(FIELD_RANK), value, field)
+
+    def add(self, plant):
+        keys = []
+        for key, payload in self.keys_for(plant):
+            if key:
+                self.trie.insert(key, plant.id, payload)
+                keys.append(key)
+        self.plants[plant.id] = {
+            'id': plant.id,
+            'name': plant.name,
+            'scientific_name': plant.scientific_name,
+            'keys': keys,
+        }
+
+    def remove(self, plant_id):
+        plant = self.plants.pop(plant_id, None)
+        if plant is None:
+            return
+        for key in plant['keys']:
+            self.trie.remove(key, plant_id)
+
+    def suggest(self, query, limit=8):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self.ensure_fresh()
+        with self.reading():
+            matches = self.trie.complete(prefix, limit)
+            results = []
+            for plant_id, (rank, text, field) in matches:
+                plant = self.plants[plant_id]
+                results.append({
+                    'id': plant_id,
+                    'name': plant['name'],
+                    'scientific_name': plant['scientific_name'],
+                    'match': text,
+                    'field': field,
+                })
+        return results
+
+
+suggestion_index = SuggestionIndex()
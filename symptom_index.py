@@ -0,0 +1,281 @@
+"""
+BM25 search over the medicinal text of approved plants.
+
+"cough" or "joint pain" should find plants by what they treat, which only
+appears in the prose fields (benefits, uses, therapeutic uses, medicinal
+properties, pharmacological actions). Those fields are tokenized into an
+inverted index whose postings are compact array('I') pairs of plant ids
+and term frequencies, and queries are ranked with Okapi BM25.
+
+The index is written to SYMPTOM_INDEX_PATH and, at startup,
+memory-mapped back when its catalogue version still matches the database,
+so workers don't re-tokenize the catalogue. Postings stay views into the
+mapping until a commit touches them. Writes happen off the commit path:
+a burst of commits is saved once, SYMPTOM_SAVE_DELAY seconds after the
+first of them, and anything still unsaved is written at exit.
+"""
+import atexit
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+
+from catalogue import PlantIndex, catalogue_version
+from metrics import metrics
+from transliterate import fold_diacritics, normalize
+
+TEXT_FIELDS = ('benefits', 'uses', 'therapeutic_uses', 'medicinal_properties', 'pharmacological_actions')
+
+K1 = 1.2
+B = 0.75
+
+MAGIC = b'BM25IDX1'
+FORMAT_VERSION = 1
+
+STOPWORDS = frozenset('''
+    a an and are as at be by for from has in into is it its of on or such that the their
+    this to used use with helps help helpful good various
+'''.split())
+
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def stem(word):
+    """Just enough suffix stripping to match plurals ("coughs", "remedies")"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    if not text:
+        return []
+    words = _TOKEN.findall(fold_diacritics(normalize(text)))
+    return [stem(word) for word in words if word not in STOPWORDS and len(word) > 1]
+
+
+class SymptomIndex(PlantIndex):
+    def __init__(self, app=None):
+        self.path = None
+        self.save_delay = 5.0
+        self._mmap = None
+        self._save_timer = None
+        self._atexit_registered = False
+        self.clear()
+        super().__init__()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SYMPTOM_INDEX_PATH', os.path.join(app.instance_path, 'symptom_index.bin'))
+        app.config.setdefault('SYMPTOM_SAVE_DELAY', 5.0)
+        self.path = app.config['SYMPTOM_INDEX_PATH']
+        self.save_delay = float(app.config['SYMPTOM_SAVE_DELAY'])
+        app.extensions['symptom_index'] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def clear(self):
+        self.postings = {}       # term -> (array('I') plant ids, array('I') term frequencies)
+        self.doc_lengths = {}    # plant_id -> token count
+        self.doc_terms = {}      # plant_id -> terms, for removal
+        self.total_length = 0
+        self._close()
+
+    def add(self, plant):
+        counts = {}
+        for field in TEXT_FIELDS:
+            for token in tokenize(getattr(plant, field)):
+                counts[token] = counts.get(token, 0) + 1
+        if not counts:
+            return
+        for term, tf in counts.items():
+            ids, tfs = self._writable(term)
+            ids.append(plant.id)
+            tfs.append(tf)
+        length = sum(counts.values())
+        self.doc_lengths[plant.id] = length
+        self.doc_terms[plant.id] = list(counts)
+        self.total_length += length
+
+    def remove(self, plant_id):
+        length = self.doc_lengths.pop(plant_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(plant_id):
+            ids, tfs = self._writable(term)
+            i = ids.index(plant_id)
+            del ids[i]
+            del tfs[i]
+            if not ids:
+                del self.postings[term]
+
+    def _writable(self, term):
+        """Postings for term as arrays, copying them out of the mmap if needed"""
+        entry = self.postings.get(term)
+        if entry is None:
+            entry = self.postings[term] = (array('I'), array('I'))
+        elif not isinstance(entry[0], array):
+            entry = self.postings[term] = (array('I', entry[0]), array('I', entry[1]))
+        return entry
+
+    def search(self, query, limit=20):
+        """[(plant_id, score)] best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        self.ensure_fresh()
+        with self.reading():
+            n = len(self.doc_lengths)
+            if not n:
+                return []
+            avgdl = self.total_length / n
+            scores = {}
+            for term in terms:
+                entry = self.postings.get(term)
+                if entry is None:
+                    continue
+                ids, tfs = entry
+                idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+                for plant_id, tf in zip(ids, tfs):
+                    norm = K1 * (1 - B + B * self.doc_lengths[plant_id] / avgdl)
+                    scores[plant_id] = scores.get(plant_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    # Persistence
+
+    def rebuild(self, plants=None):
+        if plants is None:
+            loaded = self._load()
+            metrics.cache_result('symptom_index_file', loaded)
+            if loaded:
+                return
+        super().rebuild(plants)
+
+    def after_update(self):
+        if self.path is not None:
+            self._schedule_save()
+
+    def shutdown(self):
+        """Write a save that is still waiting on its timer"""
+        timer = self._save_timer
+        if timer is not None and timer.is_alive():
+            timer.cancel()
+            self._save_now()
+
+    def _version_key(self):
+        return [FORMAT_VERSION, *(self._version or catalogue_version())]
+
+    def _schedule_save(self):
+        # Rewriting the whole file on every commit costs more as the catalogue grows
+        timer = self._save_timer
+        if timer is not None and timer.is_alive():
+            return
+        self._save_timer = threading.Timer(self.save_delay, self._save_now)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _save_now(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        # Postings must be owned before the mapped file is replaced
+        if self._mmap is not None:
+            for term in list(self.postings):
+                self._writable(term)
+            self._close()
+
+        header = {
+            'version': self._version_key(),
+            'total_length': self.total_length,
+            'doc_lengths': self.doc_lengths,
+            'doc_terms': self.doc_terms,
+            'terms': {},
+        }
+        body = []
+        offset = 0
+        for term, (ids, tfs) in self.postings.items():
+            header['terms'][term] = [offset, len(ids)]
+            body.extend((ids, tfs))
+            offset += len(ids) * 8
+
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        # Pad so the postings start 4-byte aligned for memoryview.cast('I')
+        header_bytes += b' ' * (-(len(MAGIC) + 4 + len(header_bytes)) % 4)
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(MAGIC)
+                f.write(struct.pack('<I', len(header_bytes)))
+                f.write(header_bytes)
+                for part in body:
+                    part.tofile(f)
+            os.replace(tmp, self.path)
+        except OSError:
+            # The file is only a startup cache; the in-memory index is current
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        try:
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError('not a symptom index')
+            (header_length,) = struct.unpack_from('<I', mapped, len(MAGIC))
+            start = len(MAGIC) + 4
+            header = json.loads(mapped[start:start + header_length])
+            version = catalogue_version()
+            if header['version'] != [FORMAT_VERSION, *version]:
+                raise ValueError('stale symptom index')
+        except (ValueError, KeyError, struct.error):
+            mapped.close()
+            return False
+
+        data = memoryview(mapped)[start + header_length:]
+        with self._lock:
+            self.clear()
+            self._mmap = (mapped, data)
+            for term, (offset, length) in header['terms'].items():
+                ids = data[offset:offset + length * 4].cast('I')
+                tfs = data[offset + length * 4:offset + length * 8].cast('I')
+                self.postings[term] = (ids, tfs)
+            self.doc_lengths = {int(k): v for k, v in header['doc_lengths'].items()}
+            self.doc_terms = {int(k): v for k, v in header['doc_terms'].items()}
+            self.total_length = header['total_length']
+            self._built = True
+            self._version = version
+            self._checked_at = time.monotonic()
+        return True
+
+    def _close(self):
+        if self._mmap is not None:
+            mapped, data = self._mmap
+            self._mmap = None
+            data.release()
+            mapped.close()
+
+
+symptom_index = SymptomIndex()
@@ -0,0 +1,162 @@
+"""
+Canonical scientific names for matching identifications to the catalogue.
+
+binomial_key() reduces a scientific name to "genus species" in lowercase
+ASCII, dropping authorities ("(L.) Dunal"), infraspecific ranks ("var.
+...") and hybrid signs, so "Withania somnifera (L.) Dunal" and "withania
+somnifera" compare equal. Names without a species epithet ("Ocimum sp.",
+"Ocimum L.", "Ocimum") get no key, so they never match another species of
+the genus. Plant.binomial_key holds the key in an indexed column,
+maintained on flush, and plant_synonym maps other accepted or historical
+names to it ("Ocimum tenuiflorum" -> "Ocimum sanctum"). match_plants()
+resolves any number of returned species in one query.
+
+    python taxonomy.py   # migrate: add the column, backfill keys, seed synonyms
+"""
+import re
+
+from sqlalchemy import event, inspect, or_, text
+
+from models import db, Plant, PlantSynonym
+from transliterate import fold_diacritics
+
+# Pairs of names for the same species; both directions are stored
+SYNONYMS = [
+    ('Ocimum tenuiflorum', 'Ocimum sanctum'),
+    ('Emblica officinalis', 'Phyllanthus emblica'),
+    ('Adhatoda vasica', 'Justicia adhatoda'),
+    ('Eclipta prostrata', 'Eclipta alba'),
+    ('Aloe barbadensis', 'Aloe vera'),
+    ('Senegalia catechu', 'Acacia catechu'),
+    ('Convolvulus prostratus', 'Convolvulus pluricaulis'),
+    ('Premna serratifolia', 'Premna integrifolia'),
+    ('Valeriana jatamansi', 'Valeriana wallichii'),
+    ('Swertia chirata', 'Swertia chirayita'),
+    ('Solanum virginianum', 'Solanum xanthocarpum'),
+    ('Solanum surattense', 'Solanum xanthocarpum'),
+    ('Boerhaavia diffusa', 'Boerhavia diffusa'),
+    ('Alhagi maurorum', 'Alhagi camelorum'),
+    ('Carum copticum', 'Trachyspermum ammi'),
+    ('Ficus bengalensis', 'Ficus benghalensis'),
+    ('Saraca indica', 'Saraca asoca'),
+    ('Picrorhiza kurrooa', 'Picrorhiza kurroa'),
+    ('Nardostachys grandiflora', 'Nardostachys jatamansi'),
+    ('Stereospermum chelonoides', 'Stereospermum suaveolens'),
+    ('Cassia fistula', 'Cathartocarpus fistula'),
+    ('Plumbago indica', 'Plumbago zeylanica'),
+]
+
+_RANKS = {'var', 'subsp', 'ssp', 'f', 'forma', 'cv', 'sp', 'spp', 'agg'}
+_WORD = re.compile(r"[a-z][a-z-]*\.?")
+
+
+def binomial_key(name):
+    """'genus species', lowercase ASCII; '' if there is no species epithet"""
+    if not name:
+        return ''
+    name = re.sub(r'\([^)]*\)', ' ', fold_diacritics(name)).replace('×', ' ').lower()
+    # A bare 'x' is the ASCII hybrid sign, like '×'
+    words = [word for word in _WORD.findall(name) if word != 'x']
+    if len(words) < 2:
+        return ''
+    genus, species = words[0].rstrip('.'), words[1]
+    # Authorities are abbreviated ("L.", "Willd.") and ranks end the binomial
+    if species.endswith('.') or species in _RANKS or len(species) < 2:
+        return ''
+    return f'{genus} {species}'
+
+
+def match_plants(names, approved_only=False):
+    """
+    {name: Plant} for every name that resolves to a catalogue plant, directly
+    or through a synonym, using a single indexed query. Approved plants and
+    then lower ids win when several share a species.
+    """
+    keys = {name: binomial_key(name) for name in names}
+    wanted = {key for key in keys.values() if key}
+    if not wanted:
+        return {}
+
+    query = (db.session.query(Plant, PlantSynonym.synonym_key)
+             .outerjoin(PlantSynonym, PlantSynonym.accepted_key == Plant.binomial_key)
+             .filter(or_(Plant.binomial_key.in_(wanted), PlantSynonym.synonym_key.in_(wanted))))
+    if approved_only:
+        query = query.filter(Plant.is_approved.is_(True))
+
+    best = {}
+    for plant, synonym_key in query:
+        for key in (plant.binomial_key, synonym_key):
+            if key in wanted:
+                current = best.get(key)
+                rank = (not plant.is_approved, plant.id)
+                if current is None or rank < (not current.is_approved, current.id):
+                    best[key] = plant
+    return {name: best[key] for name, key in keys.items() if key in best}
+
+
+class Taxonomy:
+    """Keeps Plant.binomial_key in step with Plant.scientific_name."""
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['taxonomy'] = self
+        if not self._listening:
+            event.listen(db.session, 'before_flush', self._before_flush)
+            self._listening = True
+
+    def _before_flush(self, session, flush_context, instances):
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Plant):
+                state = inspect(obj)
+                if state.pending or state.attrs.scientific_name.history.has_changes():
+                    obj.binomial_key = binomial_key(obj.scientific_name) or None
+
+    def add_synonym(self, name, accepted_name, source='seed'):
+        """Record that `name` and `accepted_name` are the same species (both ways)"""
+        a, b = binomial_key(name), binomial_key(accepted_name)
+        if not a or not b or a == b:
+            return
+        for synonym_key, accepted_key, display in ((a, b, name), (b, a, accepted_name)):
+            exists = PlantSynonym.query.filter_by(synonym_key=synonym_key, accepted_key=accepted_key).first()
+            if not exists:
+                db.session.add(PlantSynonym(synonym_key=synonym_key, accepted_key=accepted_key,
+                                            name=display, source=source))
+
+    def migrate(self):
+        """
+        Add plant.binomial_key to databases created before it existed, fill
+        it in, and seed the synonym table. Safe to run repeatedly.
+        """
+        db.create_all()
+        columns = {column['name'] for column in inspect(db.engine).get_columns('plant')}
+        unkeyed = Plant.query.filter(Plant.binomial_key.is_(None), Plant.scientific_name.isnot(None))
+        if 'binomial_key' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE plant ADD COLUMN binomial_key VARCHAR(120)'))
+                conn.execute(text('CREATE INDEX IF NOT EXISTS ix_plant_binomial_key ON plant (binomial_key)'))
+        else:
+            # Genus-only names stay NULL by design; only a name with a second word can gain a key
+            unkeyed = unkeyed.filter(Plant.scientific_name.like('% %'))
+
+        for plant in unkeyed.all():
+            plant.binomial_key = binomial_key(plant.scientific_name) or None
+        for name, accepted_name in SYNONYMS:
+            self.add_synonym(name, accepted_name)
+        db.session.commit()
+
+
+taxonomy = Taxonomy()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        taxonomy.migrate()
+        print(f'{Plant.query.filter(Plant.binomial_key.isnot(None)).count()} plants keyed, '
+              f'{PlantSynonym.query.count()} synonym rows')
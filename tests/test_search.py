@@ -0,0 +1,53 @@
+import pytest
+
+from app import create_app, init_database
+from models import db, Plant, User
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "plants.db"}',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'SYMPTOM_INDEX_PATH': str(tmp_path / 'symptom.bin'),
+        'SEMANTIC_INDEX_DIR': str(tmp_path / 'semantic'),
+        'PASSWORD_HASH_WORKERS': 0,
+    })
+    init_database(app)
+    with app.app_context():
+        user = User(username='gardener', email='gardener@example.com')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([
+            Plant(name='Neem', scientific_name='Azadirachta indica', rasa='Tikta, Kashaya',
+                  uses='Fever, skin infections and itching', is_approved=True, user_id=user.id),
+            Plant(name='Giloy', scientific_name='Tinospora cordifolia', rasa='Tikta',
+                  uses='Chronic fever and immunity', is_approved=True, user_id=user.id),
+            Plant(name='Ginger', scientific_name='Zingiber officinale', rasa='Katu',
+                  uses='Fever, nausea and indigestion', is_approved=True, user_id=user.id),
+            Plant(name='Amla', scientific_name='Phyllanthus emblica', rasa='Amla',
+                  uses='Hair care and immunity', is_approved=True, user_id=user.id),
+        ])
+        db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize('mode', ['symptom', 'semantic'])
+def test_ranked_search_with_facet_and_no_query(client, mode):
+    response = client.get(f'/api/search?mode={mode}&rasa=Tikta')
+    assert response.status_code == 200
+    assert response.json == []
+
+
+@pytest.mark.parametrize('mode', ['symptom', 'semantic'])
+def test_ranked_search_facet_narrows_scored_plants(client, mode):
+    response = client.get(f'/api/search?mode={mode}&q=fever&rasa=Tikta')
+    assert response.status_code == 200
+    names = [plant['name'] for plant in response.json]
+    assert names and set(names) <= {'Neem', 'Giloy'}
+    assert all('score' in plant for plant in response.json)
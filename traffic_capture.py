@@ -0,0 +1,142 @@
+"""
+Opt-in capture of production traffic for offline replay.
+
+With TRAFFIC_CAPTURE_ENABLED set, every request (or a TRAFFIC_CAPTURE_SAMPLE_RATE
+fraction of them) is recorded as one JSON line:
+
+    {"ts": 1760900000.123, "method": "GET", "path": "/", "query": "q=tulsi",
+     "endpoint": "index", "status": 200, "duration_ms": 12.4, "bytes": 48211,
+     "role": "anonymous"}
+
+Only the method, path, query string, timing and the user's role are kept:
+no bodies, headers or cookies, and the values of query parameters that look
+like credentials or personal data are replaced with "redacted". Lines are
+handed to a QueueListener thread that writes them to
+TRAFFIC_CAPTURE_DIR/traffic.<pid>.jsonl, rotating at
+TRAFFIC_CAPTURE_MAX_BYTES and keeping TRAFFIC_CAPTURE_BACKUPS old files,
+one set per worker process. `python -m benchmarks.replay` plays them back.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from flask import g, request
+from flask_login import current_user
+
+SENSITIVE_PARAMS = ('password', 'token', 'secret', 'key', 'csrf', 'email', 'session', 'auth')
+REDACTED = 'redacted'
+
+logger = logging.getLogger('herbal_garden.traffic')
+
+
+def sanitize_query(query_string):
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([(name, REDACTED if any(word in name.lower() for word in SENSITIVE_PARAMS) else value)
+                      for name, value in pairs])
+
+
+class TrafficCapture:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.sample_rate = 1.0
+        self.max_bytes = 0
+        self.backups = 0
+        self.exclude = ()
+        self._listener = None
+        self._owner_pid = None
+        self._atexit_registered = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TRAFFIC_CAPTURE_ENABLED', False)
+        app.config.setdefault('TRAFFIC_CAPTURE_DIR', os.path.join(app.instance_path, 'traffic'))
+        app.config.setdefault('TRAFFIC_CAPTURE_SAMPLE_RATE', 1.0)
+        app.config.setdefault('TRAFFIC_CAPTURE_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('TRAFFIC_CAPTURE_BACKUPS', 5)
+        app.config.setdefault('TRAFFIC_CAPTURE_EXCLUDE', ('static', 'metrics'))
+        self.enabled = bool(app.config['TRAFFIC_CAPTURE_ENABLED'])
+        self.directory = app.config['TRAFFIC_CAPTURE_DIR']
+        self.sample_rate = float(app.config['TRAFFIC_CAPTURE_SAMPLE_RATE'])
+        self.max_bytes = int(app.config['TRAFFIC_CAPTURE_MAX_BYTES'])
+        self.backups = int(app.config['TRAFFIC_CAPTURE_BACKUPS'])
+        self.exclude = frozenset(app.config['TRAFFIC_CAPTURE_EXCLUDE'])
+        app.extensions['traffic_capture'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def _before_request(self):
+        if request.endpoint not in self.exclude and random.random() < self.sample_rate:
+            g._capture_start = (time.time(), time.perf_counter())
+
+    def _after_request(self, response):
+        start = g.pop('_capture_start', None)
+        if start is None:
+            return response
+        ts, started = start
+        duration = time.perf_counter() - started
+        if current_user.is_authenticated:
+            role = current_user.role or 'user'
+        else:
+            role = 'anonymous'
+        record = {
+            'ts': round(ts, 3),
+            'method': request.method,
+            'path': request.path,
+            'query': sanitize_query(request.query_string.decode('utf-8', 'replace')),
+            'endpoint': request.endpoint or 'unmatched',
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'bytes': response.calculate_content_length(),
+            'role': role,
+        }
+        self._ensure_listener()
+        logger.info(json.dumps(record, separators=(',', ':')))
+        return response
+
+    def _ensure_listener(self):
+        # Started lazily and per process: each worker writes its own files
+        pid = os.getpid()
+        if self._owner_pid == pid:
+            return
+        with self._lock:
+            if self._owner_pid == pid:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.directory, f'traffic.{pid}.jsonl'),
+                maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+
+            records = queue.SimpleQueue()
+            logger.handlers = [logging.handlers.QueueHandler(records)]
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            self._owner_pid = pid
+
+    def shutdown(self):
+        """Write out anything still queued"""
+        if self._listener is not None and self._owner_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._owner_pid = None
+
+
+traffic_capture = TrafficCapture()
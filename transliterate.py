@@ -0,0 +1,143 @@
+"""
+Script-neutral search keys for plant names.
+
+Plants carry Devanagari Hindi/Sanskrit names ("नागकेसर") while users type
+Latin ("nagkesar"). Every name and every query is reduced to the same set
+of keys:
+
+* the NFC-normalized, case-folded text (exact matches in either script)
+* a diacritic-folded ASCII form ("Āmalakī" -> "amalaki")
+* for Devanagari, a Latin transliteration ("नागकेसर" -> "naagakesar")
+* a phonetic skeleton of the Latin form that ignores the spelling
+  differences transliteration introduces: aspiration, vowel length, doubled
+  letters and the inherent 'a' ("nagkesar" and "naagakesar" -> "ngkesr")
+"""
+import re
+import unicodedata
+
+_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ii', 'उ': 'u', 'ऊ': 'uu', 'ऋ': 'ri',
+    'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au', 'ऍ': 'e', 'ऑ': 'o',
+}
+
+_MATRAS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ii', 'ु': 'u', 'ू': 'uu', 'ृ': 'ri',
+    'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au', 'ॅ': 'e', 'ॉ': 'o',
+}
+
+_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n',
+    'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'n',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n',
+    'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'ळ': 'l', 'व': 'v',
+    'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h',
+}
+
+# Consonant + nukta
+_NUKTA_FORMS = {'क': 'q', 'ख': 'kh', 'ग': 'g', 'ज': 'z', 'ड': 'r', 'ढ': 'rh', 'फ': 'f'}
+
+_SIGNS = {'ं': 'n', 'ँ': 'n', 'ः': 'h', '।': ' ', '॥': ' '}
+
+VIRAMA = '्'
+NUKTA = '़'
+
+# Applied in order to the lowercase ASCII form
+_SKELETON_RULES = [
+    ('chh', 'c'), ('ch', 'c'), ('sh', 's'), ('ph', 'f'), ('kh', 'k'), ('gh', 'g'),
+    ('jh', 'j'), ('th', 't'), ('dh', 'd'), ('bh', 'b'), ('w', 'v'), ('z', 'j'),
+    ('q', 'k'), ('ee', 'i'), ('oo', 'u'),
+]
+
+_DOUBLED = re.compile(r'(.)\1+')
+_NON_WORD = re.compile(r'[^0-9a-z ]+')
+
+
+def has_devanagari(text):
+    return any('ऀ' <= ch <= 'ॿ' for ch in text)
+
+
+def devanagari_to_latin(text):
+    """Transliterate Devanagari to ASCII, deleting the word-final inherent 'a'"""
+    text = unicodedata.normalize('NFC', text)
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in _CONSONANTS:
+            if i + 1 < n and text[i + 1] == NUKTA:
+                out.append(_NUKTA_FORMS.get(ch, _CONSONANTS[ch]))
+                i += 1
+            else:
+                out.append(_CONSONANTS[ch])
+            following = text[i + 1] if i + 1 < n else ''
+            if following in _MATRAS:
+                out.append(_MATRAS[following])
+                i += 1
+            elif following == VIRAMA:
+                i += 1
+            elif following and ('ऀ' <= following <= 'ॿ') and following not in _SIGNS:
+                out.append('a')
+            elif following in ('ं', 'ँ', 'ः'):
+                out.append('a')
+            # else: end of word, schwa deleted
+        elif ch in _VOWELS:
+            out.append(_VOWELS[ch])
+        elif ch in _SIGNS:
+            out.append(_SIGNS[ch])
+        elif '०' <= ch <= '९':
+            out.append(str(ord(ch) - ord('०')))
+        elif ch in _MATRAS or ch in (VIRAMA, NUKTA):
+            pass
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def fold_diacritics(text):
+    """Strip accents from Latin letters, leaving other scripts untouched"""
+    out = []
+    for ch in unicodedata.normalize('NFC', text):
+        if ch.isascii() or not ch.isalpha() or has_devanagari(ch):
+            out.append(ch)
+            continue
+        base = unicodedata.normalize('NFKD', ch)
+        stripped = ''.join(c for c in base if not unicodedata.combining(c))
+        out.append(stripped if stripped.isascii() else ch)
+    return ''.join(out)
+
+
+def normalize(text):
+    return ' '.join(unicodedata.normalize('NFC', text).casefold().split())
+
+
+def to_latin(text):
+    """Lowercase ASCII-ish Latin form of a name in either script"""
+    text = normalize(text)
+    if has_devanagari(text):
+        text = devanagari_to_latin(text)
+    return fold_diacritics(text)
+
+
+def skeleton(text):
+    latin = _NON_WORD.sub(' ', to_latin(text))
+    words = []
+    for word in latin.split():
+        for old, new in _SKELETON_RULES:
+            word = word.replace(old, new)
+        word = _DOUBLED.sub(r'\1', word)
+        word = word[:1] + word[1:].replace('a', '')
+        if word:
+            words.append(word)
+    return ' '.join(words)
+
+
+def search_keys(text):
+    """Every key a name (or query) is indexed/looked up under"""
+    if not text or not text.strip():
+        return set()
+    keys = {normalize(text), fold_diacritics(normalize(text)), to_latin(text), skeleton(text)}
+    keys.discard('')
+    return keys
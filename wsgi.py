@@ -0,0 +1,6 @@
+"""WSGI entry point, e.g. `waitress-serve --port=8080 wsgi:app`."""
+from app import create_app, init_database
+
+app = create_app()
+# Idempotent: creates missing tables and applies in-place column migrations
+init_database(app)